@@ -15,11 +15,14 @@ from api.config import HOST, PORT, DEBUG
 from api.routes import api
 from api.routes.fbp import fbp_bp
 from api.routes.chat import chat_bp
+from api.services import get_warmup, get_job_queue
+from api.utils.uploads import InMemoryUploadRequest
 
 
 def create_app():
     """Application factory"""
     app = Flask(__name__, static_folder=None)  # Disable default static
+    app.request_class = InMemoryUploadRequest  # Keep uploaded slices off disk
     CORS(app)
     
     # Register blueprints
@@ -27,6 +30,12 @@ def create_app():
     app.register_blueprint(fbp_bp)
     app.register_blueprint(chat_bp)
     
+    # Load and warm up the model; /api/ready reports 503 until done
+    get_warmup().start(background=True)
+    
+    # Resume persisted jobs and start the job workers
+    get_job_queue().start()
+    
     # Static file routes
     @app.route('/')
     def index():
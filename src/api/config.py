@@ -9,12 +9,144 @@ UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads')
 RESULTS_FOLDER = os.path.join(PROJECT_ROOT, 'results')
 MODEL_PATH = os.path.join(PROJECT_ROOT, 'model', 'best.pt')
 
+# Uploads up to this many bytes are kept in memory instead of temp files
+UPLOAD_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Stream multipart uploads: slices are processed while the body is arriving
+STREAMING_UPLOADS = True
+STREAM_CHUNK_SIZE = 64 * 1024
+
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'dcm', 'dicom'}  # DICOM needs pydicom
 
 # Video settings
 VIDEO_FPS = 10
 VIDEO_CODEC = 'vp80'  # WebM format
+VIDEO_DEFAULT_CODEC = 'vp8'
+VIDEO_CODECS = {  # name -> (fourcc, file extension); selectable per request
+    'vp8': (VIDEO_CODEC, '.webm'),
+    'mjpeg': ('MJPG', '.avi'),
+    'h264': ('avc1', '.mp4'),  # Only if OpenCV was built with an H.264 encoder
+    'mp4v': ('mp4v', '.mp4'),
+}
+VIDEO_QUALITY_PRESETS = {'fast': 50, 'balanced': 75, 'high': 95}
+
+# Segment-parallel encoding (needs ffmpeg to join segments, else serial)
+ENCODER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+ENCODER_SEGMENT_FRAMES = 64
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+# Video export: 'inline' renders during processing, 'background' after the
+# response is sent, 'none' only on request (POST /api/series/<id>/export)
+VIDEO_EXPORT_MODE = 'inline'
+
+# Draw detection boxes into video frames; when off, clients draw them from
+# the <video>.overlays.json track written next to every video
+BURN_OVERLAYS = True
+
+# Series store: decoded slices and detections kept for the slice viewer API
+SERIES_STORE_ENABLED = True
+SERIES_FOLDER = os.path.join(PROJECT_ROOT, 'series')
+# 'png': one lossless file per slice; 'volume': one memory-mapped .npy
+# (slices x H x W) for zero-copy re-analysis, MPR planes and thumbnails
+SERIES_STORAGE = 'png'
+SERIES_RETENTION = 7 * 24 * 3600  # Seconds a series is kept after its last change (None: forever)
+SLICE_CACHE_SIZE = 256  # Encoded slices kept in memory
+SLICE_JPEG_QUALITY = 85
+
+# Decoded slice cache: slices reused by re-analysis, thumbnails and the
+# viewer are decoded once (keyed by path + mtime or by upload content)
+DECODED_CACHE_ENABLED = True
+DECODED_CACHE_BYTES = 512 * 1024 * 1024
+
+# 16-bit slices: stored value + SLICE_HU_OFFSET = HU. Windows are
+# (center, width) in HU, applied through 65536-entry lookup tables
+SLICE_HU_OFFSET = -1024
+WINDOW_PRESETS = {
+    'lung': (-600, 1500),
+    'soft_tissue': (40, 400),
+    'bone': (400, 1800),
+}
+DEFAULT_WINDOW = None  # Preset for 16-bit slices; None scales 0-65535 linearly
+
+# Job queue: /api/jobs runs series asynchronously; jobs and their uploads
+# are kept here so queued work survives a restart
+JOBS_FOLDER = os.path.join(PROJECT_ROOT, 'jobs')
+JOB_WORKERS = 1  # Series processed concurrently (each uses the shared model)
+JOB_EVENT_HEARTBEAT = 15  # Seconds between SSE keep-alive comments
+# Resubmissions with the same idempotency key (Idempotency-Key header or
+# patient name + slice content) attach to the existing job; finished jobs
+# are reused for this many seconds, then deleted with their folders
+JOB_IDEMPOTENCY_TTL = 24 * 3600
+JOB_QUEUE_LIMIT = 32  # Queued jobs before /api/jobs answers 429
+
+# Admission control: estimated cost allowed in flight per endpoint. Requests
+# over budget wait (up to max_queue of them, max_wait seconds each), the
+# rest get 429 + Retry-After. create_video costs slice megapixels
+# (slices x width x height / 1e6); fbp costs detectors^2 x angles / 1e6
+ADMISSION_POOLS = {
+    'create_video': {'budget': 256, 'max_queue': 8, 'max_wait': 120},
+    'fbp': {'budget': 200, 'max_queue': 4, 'max_wait': 30},
+}
+# Streamed uploads are admitted before their slices are read: the cost is
+# estimated from Content-Length at this many encoded bytes per pixel
+ADMISSION_BYTES_PER_PIXEL = 0.6
+
+# Priority scheduler: compute slots shared by interactive (FBP),
+# standard (create_video, redetect) and batch (backfill jobs, exports) work.
+# Slots go to waiting classes in proportion to their weights, and the
+# reserved slots are never given to standard or batch work.
+SCHEDULER_SLOTS = 4
+SCHEDULER_WEIGHTS = {'interactive': 8, 'standard': 3, 'batch': 1}
+SCHEDULER_INTERACTIVE_RESERVED = 1
+
+# Pipeline: decode in a thread pool and encode on a dedicated thread so both
+# overlap with inference
+PIPELINE_ENABLED = True
+PIPELINE_DECODE_WORKERS = 4
+PIPELINE_QUEUE_SIZE = 16  # Max frames buffered between stages
+
+# Checkpoints: queued jobs save their progress every CHECKPOINT_INTERVAL
+# slices (every encoded segment when segments are encoded in parallel) and
+# resume from the last checkpoint after a restart
+CHECKPOINT_INTERVAL = ENCODER_SEGMENT_FRAMES
+
+# Deadlines: create_video and redetect accept deadline=<seconds>. Detection
+# may use DEADLINE_DETECTION_SHARE of it (adaptive sampling, video export
+# deferred to the background); slices not analyzed in time are reported as
+# pending and analyzed in the background afterwards
+DEADLINE_DETECTION_SHARE = 0.6
+
+# Detection settings
+DETECTION_CONF = 0.25  # YOLO confidence threshold
+DETECTION_IOU = 0.7    # YOLO NMS IoU threshold
+
+# Model warmup: dummy inferences run at startup before reporting ready
+WARMUP_SIZES = [(512, 512)]  # (width, height) of typical slices
+WARMUP_RUNS = 2              # Inferences per size
+
+# Detection cache settings
+DETECTION_CACHE_ENABLED = True
+DETECTION_CACHE_FOLDER = os.path.join(PROJECT_ROOT, 'cache', 'detections')
+DETECTION_CACHE_SIZE = 4096  # Max entries kept in memory
+
+# Change gating: skip detection on near-duplicate adjacent slices
+GATE_ENABLED = False
+GATE_THRESHOLD = 1.5   # Mean abs difference (0-255) on downsampled slices
+GATE_DOWNSAMPLE = 64   # Thumbnail side length used for the difference metric
+
+# Slice sampling: 'exhaustive' runs detection on every slice, 'adaptive' runs
+# it on every SAMPLING_STRIDE-th slice and densely around positive slices
+SAMPLING_MODE = 'exhaustive'
+SAMPLING_STRIDE = 4
+SAMPLING_RADIUS = 4
+
+# Body auto-crop: None, 'detect' (crop detector input only) or 'encode'
+# (also encode the cropped frames)
+BODY_CROP_MODE = None
+BODY_CROP_THRESHOLD = 20  # Intensity (0-255) separating body from background
+BODY_CROP_MARGIN = 8      # Padding in pixels around the body box
+BODY_CROP_SAMPLES = 8     # Slices sampled to build the series-wide box
 
 # API settings
 PHP_API_URL = "https://viegrand.site/phpfpb/api.php"
@@ -2,30 +2,326 @@
 Flask API Routes
 """
 import os
+import json
+import time
+import hashlib
 import shutil
 import glob
+from itertools import chain
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, request, jsonify, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
 
-from ..config import UPLOAD_FOLDER, RESULTS_FOLDER, MODEL_PATH, allowed_file
-from ..services import get_detector, get_video_processor, ReportGenerator
-from ..utils.api_client import upload_file_to_php
+from ..config import (
+    UPLOAD_FOLDER, RESULTS_FOLDER, MODEL_PATH, STREAMING_UPLOADS, SLICE_JPEG_QUALITY,
+    WINDOW_PRESETS, JOB_EVENT_HEARTBEAT, JOB_QUEUE_LIMIT, ADMISSION_BYTES_PER_PIXEL
+)
+from ..services import (
+    get_detector, get_video_processor, get_warmup, get_series_store, get_detection_cache,
+    get_job_queue, publish_result, ReportGenerator, VideoProcessor
+)
+from ..services.job_queue import FINAL_STATUSES
+from ..services.admission import AdmissionRejected, get_admission, series_cost
+from ..services.scheduler import get_scheduler
+from ..services.series_store import SLICE_FORMATS, SLICE_PLANES
+from ..services.video_processor import overlay_track_path
+from ..utils.decoded_cache import get_decoded_cache
+from ..utils.file_utils import MemoryImage, image_resolution
+from ..utils.multipart_stream import iter_multipart
+from ..utils.uploads import (
+    collect_uploads, upload_digest, upload_extension, upload_file_extension, submission_key
+)
+from ..utils.window_lut import resolve_window
 
 
 # Create blueprint
 api = Blueprint('api', __name__)
 
-# Initialize detector
-detector = get_detector(MODEL_PATH)
+
+def _get_form_number(name, cast=float, form=None):
+    """Parse an optional numeric form field, returning None if missing or invalid"""
+    form = request.form if form is None else form
+    try:
+        value = form.get(name)
+        if value:
+            return cast(value)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _get_form_flag(name, form):
+    """Parse an optional boolean form field, returning None if missing"""
+    value = form.get(name)
+    if value in (None, ''):
+        return None
+    return str(value).lower() not in ('0', 'false', 'no', 'off')
+
+
+def _processing_options(form):
+    """
+    Read optional VideoProcessor options from form fields
+    
+    Raises:
+        ValueError: If the window is not a preset or 'center,width'
+    """
+    return {
+        'gate_threshold': _get_form_number('gate_threshold', form=form),
+        'sampling': form.get('sampling') or None,
+        'sample_stride': _get_form_number('sample_stride', int, form=form),
+        'sample_radius': _get_form_number('sample_radius', int, form=form),
+        'crop': form.get('crop') or None,
+        'codec': form.get('codec') or None,
+        'window': resolve_window(form.get('window')),
+        'quality': form.get('quality') or None,
+        'export': form.get('export') or None,
+        'burn_overlays': _get_form_flag('burn_overlays', form)
+    }
+
+
+def _video_priority(form):
+    """
+    Read the scheduler class of a video request ('standard' or 'batch')
+    
+    Interactive slots are kept for FBP reconstructions, so video work cannot ask for them.
+    
+    Raises:
+        ValueError: If the priority is not 'standard' or 'batch'
+    """
+    priority = form.get('priority') or 'standard'
+    if priority not in ('standard', 'batch'):
+        raise ValueError(f'Invalid priority: {priority} (standard, batch)')
+    return priority
+
+
+def _request_deadline(form):
+    """
+    Read the optional time budget of a request (deadline field, in seconds)
+    
+    Raises:
+        ValueError: If the deadline is not a positive number
+    """
+    if form.get('deadline') in (None, ''):
+        return None
+    deadline = _get_form_number('deadline', form=form)
+    if deadline is None or deadline <= 0:
+        raise ValueError('Invalid deadline (seconds > 0)')
+    return deadline
+
+
+def _time_left(deadline, started):
+    """Part of a deadline not yet spent since the request started (None without one)"""
+    if deadline is None:
+        return None
+    return deadline - (time.perf_counter() - started)
+
+
+class _DuplicateSubmission(Exception):
+    """Raised when a streamed upload turns out to duplicate another job"""
+    
+    def __init__(self, job_id):
+        super().__init__(f'Duplicate of job {job_id}')
+        self.job_id = job_id
+
+
+def _client_key(form):
+    """Client-supplied idempotency key (Idempotency-Key header or form field)"""
+    key = request.headers.get('Idempotency-Key') or form.get('idempotency_key')
+    return f'client:{key}' if key else None
+
+
+def _content_key(patient_name, options, pixel_spacing, slice_digests):
+    """Idempotency key derived from patient name, options, pixel spacing and slice contents"""
+    options = {**options, 'pixel_spacing': pixel_spacing}
+    return f'content:{submission_key(patient_name, options, slice_digests)}'
+
+
+def _job_response(job):
+    """create_video response for a finished job"""
+    if job is None:
+        # The job was dropped before running (its request was not admitted)
+        return jsonify({'error': 'Máy chủ đang bận, vui lòng thử lại sau'}), 503
+    if job['status'] == 'done':
+        return jsonify(job['result'])
+    return jsonify({'error': job['error'] or 'Unknown error'}), 500
+
+
+def _run_admitted(job_id, cost, run):
+    """Run an inline create_video job once admission control lets it in"""
+    jobs = get_job_queue()
+    try:
+        with get_admission().admit('create_video', cost):
+            return _job_response(jobs.run_inline(job_id, run))
+    except AdmissionRejected as e:
+        print(f"🚦 Từ chối create_video ({e.reason}), thử lại sau {e.retry_after}s")
+        jobs.discard(job_id)
+        return jsonify(e.body()), 429, e.headers()
+
+
+def _unfinished_job_result(job):
+    """
+    Partial create_video answer for a job still running when the deadline
+    expired; the result is then available from the job URLs
+    """
+    return {
+        'success': True,
+        'partial': True,
+        'job_id': job['id'],
+        'job_status': job['status'],
+        'progress': job['progress'],
+        'status_url': f'/api/jobs/{job["id"]}',
+        'events_url': f'/api/jobs/{job["id"]}/events'
+    }
+
+
+def _attach_to_job(job_id, timeout=None):
+    """
+    Wait for the job a duplicate submission was coalesced into
+    
+    Args:
+        job_id: Job id of the first submission
+        timeout: Remaining deadline in seconds (None waits until it finishes)
+    """
+    print(f"🔁 Yêu cầu trùng lặp, dùng kết quả job {job_id}")
+    job = get_job_queue().wait(job_id, None if timeout is None else max(0.0, timeout))
+    if job is not None and job['status'] not in FINAL_STATUSES:
+        return jsonify(_unfinished_job_result(job))
+    return _job_response(job)
+
+
+def _create_video_streaming(started):
+    """
+    Create video while the multipart body is still arriving
+    
+    Each image part is handed to the pipeline as soon as it is received.
+    Fields sent before the first image (patient_name, options) apply to
+    the whole run; pixel_spacing may also arrive after the images.
+    
+    A client idempotency key coalesces duplicates up front. The content
+    key is only known once the upload is complete: a duplicate found then
+    stops this run, which takes over the existing job's result.
+    """
+    fields = {}
+    parts = iter_multipart(request.stream, request.content_type)
+    
+    # A body without a boundary or with broken framing is a client error
+    first_image = None
+    try:
+        for part in parts:
+            if part.filename is None:
+                fields[part.name] = part.data
+            elif part.name == 'images':
+                first_image = part
+                break
+    except ValueError as e:
+        return jsonify({'error': f'Dữ liệu upload không hợp lệ: {e}'}), 400
+    
+    if first_image is None:
+        return jsonify({'error': 'Không có file ảnh'}), 400
+    
+    patient_name = fields.get('patient_name', 'Unknown')
+    try:
+        options = _processing_options(fields)
+        priority = _video_priority(fields)
+        deadline = _request_deadline(fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    print(f"👤 Bệnh nhân: {patient_name} (streaming)")
+    
+    jobs = get_job_queue()
+    job_id, created = jobs.create('create_video', {
+        'patient_name': patient_name,
+        'options': options
+    }, key=_client_key(fields), inline=True)
+    if not created:
+        return _attach_to_job(job_id, _time_left(deadline, started))
+    
+    received = [0]
+    digests = []
+    
+    def slices():
+        for part in chain([first_image], parts):
+            if part.filename is None:
+                fields[part.name] = part.data
+            elif part.name == 'images':
+                ext = upload_extension(part.filename, part.data)
+                if ext is None:
+                    continue
+                digests.append(hashlib.sha256(part.data).hexdigest())
+                yield MemoryImage(f"image_{received[0]:04d}.{ext}", part.data)
+                received[0] += 1
+        owner = jobs.add_key(job_id, _content_key(
+            patient_name, options, _get_form_number('pixel_spacing', form=fields), digests
+        ))
+        if owner != job_id:
+            raise _DuplicateSubmission(owner)
+    
+    def run(progress):
+        processor = get_video_processor(get_detector(MODEL_PATH))
+        try:
+            with get_scheduler().slot(priority):
+                result = processor.process_images_to_video(
+                    slices(), patient_name, progress=progress,
+                    deadline=_time_left(deadline, started), **options
+                )
+        except _DuplicateSubmission as e:
+            print(f"🔁 Yêu cầu trùng lặp, dùng kết quả job {e.job_id}")
+            progress('coalesced')
+            timeout = _time_left(deadline, started)
+            owner = jobs.wait(e.job_id, None if timeout is None else max(0.0, timeout))
+            if owner is not None and owner['status'] not in FINAL_STATUSES:
+                return _unfinished_job_result(owner)
+            if owner is None:
+                raise RuntimeError('Máy chủ đang bận, vui lòng thử lại sau')
+            if owner['status'] != 'done':
+                raise RuntimeError(owner['error'] or 'Unknown error')
+            return owner['result']
+        if not result['success']:
+            raise RuntimeError(result.get('error', 'Unknown error'))
+        
+        print(f"💾 Đã nhận {received[0]} ảnh (streaming)")
+        
+        # Fields that arrived after the images
+        pixel_spacing = _get_form_number('pixel_spacing', form=fields)
+        VideoProcessor.apply_pixel_spacing(result['detections'], pixel_spacing)
+        result['patient_name'] = fields.get('patient_name', patient_name)
+        if result['series_id'] and pixel_spacing:
+            get_series_store().update_meta(
+                result['series_id'], detections=result['detections'], pixel_spacing=pixel_spacing
+            )
+        
+        progress('publishing')
+        return publish_result(result, result['patient_name'])
+    
+    # Slices are not read yet: estimate their size from the body length
+    # (unknown length counts as the whole budget)
+    if request.content_length:
+        cost = request.content_length / ADMISSION_BYTES_PER_PIXEL / 1e6
+    else:
+        cost = float('inf')
+    
+    response = _run_admitted(job_id, cost, run)
+    # A job that was not admitted is discarded before reading any slice
+    if received[0] == 0 and jobs.get(job_id) is not None:
+        return jsonify({'error': 'Không có ảnh hợp lệ'}), 400
+    return response
 
 
 @api.route('/api/create_video', methods=['POST'])
 def create_video():
-    """Create video from uploaded images with tumor detection"""
+    """
+    Create video from uploaded images with tumor detection
+    
+    With a deadline (seconds) the answer may be partial: slices not analyzed
+    in time are finished in the background (see completion_url).
+    """
     print("📥 Nhận request tạo video")
+    started = time.perf_counter()
     
     try:
+        if STREAMING_UPLOADS and request.mimetype == 'multipart/form-data':
+            return _create_video_streaming(started)
+        
         # Get patient info
         patient_name = request.form.get('patient_name', 'Unknown')
         pixel_spacing = None
@@ -35,6 +331,12 @@ def create_video():
                 pixel_spacing = float(ps)
         except:
             pass
+        try:
+            options = _processing_options(request.form)
+            priority = _video_priority(request.form)
+            deadline = _request_deadline(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         print(f"👤 Bệnh nhân: {patient_name}")
         
@@ -47,70 +349,285 @@ def create_video():
         if not files:
             return jsonify({'error': 'Vui lòng chọn ít nhất một ảnh'}), 400
         
-        # Create temp folder
-        safe_patient = secure_filename(patient_name) or 'unknown_patient'
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        patient_folder = os.path.join(UPLOAD_FOLDER, f'{safe_patient}_{timestamp}')
-        os.makedirs(patient_folder, exist_ok=True)
-        
-        # Save images
-        image_files = []
-        for i, file in enumerate(files):
-            if file and allowed_file(file.filename):
-                ext = file.filename.rsplit('.', 1)[1].lower()
-                filename = f"image_{i:04d}.{ext}"
-                filepath = os.path.join(patient_folder, filename)
-                file.save(filepath)
-                image_files.append(filepath)
-        
-        if not image_files:
+        # Duplicate submissions (same key, or same patient, options and
+        # slices) wait for the first one instead of processing again
+        digests = [upload_digest(f) for f in files if upload_file_extension(f)]
+        if not digests:
             return jsonify({'error': 'Không có ảnh hợp lệ'}), 400
         
-        print(f"💾 Đã lưu {len(image_files)} ảnh")
-        
-        # Process video
-        processor = get_video_processor(detector)
-        result = processor.process_images_to_video(
-            image_files, patient_name, pixel_spacing
-        )
-        
-        if not result['success']:
-            return jsonify({'error': result.get('error', 'Unknown error')}), 500
-        
-        # Cleanup temp folder
-        shutil.rmtree(patient_folder)
-        
-        # Upload to PHP server
-        remote_video_url = upload_file_to_php(result['video_path'])
-        
-        remote_frames = []
-        for local_path in result['detected_frames']:
-            remote_url = upload_file_to_php(local_path)
-            if remote_url:
-                remote_frames.append(remote_url)
-            else:
-                remote_frames.append(f'/results/{os.path.basename(local_path)}')
-        
-        final_video_url = remote_video_url or f'/results/{result["video_name"]}'
-        
-        # Generate report
-        report, report_path = ReportGenerator.create_report(
-            result, final_video_url, remote_frames
-        )
-        
-        return jsonify({
-            'success': True,
-            'video_url': final_video_url,
+        jobs = get_job_queue()
+        job_id, created = jobs.create('create_video', {
             'patient_name': patient_name,
-            'frame_count': result['frame_count'],
-            'detected_frames': remote_frames,
-            'report_url': f'/results/{os.path.basename(report_path)}'
-        })
+            'pixel_spacing': pixel_spacing,
+            'options': options
+        }, key=_client_key(request.form) or _content_key(patient_name, options, pixel_spacing, digests),
+            inline=True)
+        if not created:
+            return _attach_to_job(job_id, _time_left(deadline, started))
+        
+        def run(progress):
+            # Temp folder, only used if the upload is too large to keep in memory
+            safe_patient = secure_filename(patient_name) or 'unknown_patient'
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            patient_folder = os.path.join(UPLOAD_FOLDER, f'{safe_patient}_{timestamp}_{job_id[:6]}')
+            
+            # Collect images (in memory unless over UPLOAD_MEMORY_LIMIT)
+            image_files, spilled = collect_uploads(files, patient_folder)
+            print(f"💾 Đã nhận {len(image_files)} ảnh" + (" (ghi ra đĩa)" if spilled else " (trong bộ nhớ)"))
+            
+            # Process video
+            try:
+                processor = get_video_processor(get_detector(MODEL_PATH))
+                with get_scheduler().slot(priority):
+                    result = processor.process_images_to_video(
+                        image_files, patient_name, pixel_spacing, progress=progress,
+                        deadline=_time_left(deadline, started), **options
+                    )
+            finally:
+                # Cleanup temp folder
+                if spilled:
+                    shutil.rmtree(patient_folder, ignore_errors=True)
+            
+            if not result['success']:
+                raise RuntimeError(result.get('error', 'Unknown error'))
+            
+            progress('publishing')
+            return publish_result(result, patient_name)
+        
+        width, height = image_resolution(files[0].stream)
+        return _run_admitted(job_id, series_cost(len(digests), width, height), run)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@api.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a series for processing and return immediately
+    
+    Takes the same form fields as /api/create_video. Poll the status URL or
+    subscribe to the events URL (SSE) for progress and the final result.
+    Resubmitting the same series returns the existing job (200, coalesced).
+    Backfills should send priority=batch so they yield to other work.
+    """
+    try:
+        options = _processing_options(request.form)
+        priority = _video_priority(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    files = [f for f in request.files.getlist('images') if upload_file_extension(f)]
+    if not files:
+        return jsonify({'error': 'Không có ảnh hợp lệ'}), 400
+    
+    jobs = get_job_queue()
+    if jobs.stats()['queued'] >= JOB_QUEUE_LIMIT:
+        rejected = AdmissionRejected('jobs', 'queue full', jobs.retry_after())
+        return jsonify(rejected.body()), 429, rejected.headers()
+    
+    patient_name = request.form.get('patient_name', 'Unknown')
+    pixel_spacing = _get_form_number('pixel_spacing')
+    key = _client_key(request.form) or _content_key(
+        patient_name, options, pixel_spacing, [upload_digest(f) for f in files]
+    )
+    job_id, created = jobs.create('create_video', {
+        'patient_name': patient_name,
+        'pixel_spacing': pixel_spacing,
+        'priority': priority,
+        'options': options
+    }, key=key)
+    
+    urls = {
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events'
+    }
+    if not created:
+        # Same submission is already queued, running or recently done
+        return jsonify({**urls, 'coalesced': True}), 200
+    
+    # Slices are persisted with the job so it survives a restart
+    try:
+        input_dir = jobs.input_dir(job_id)
+        for i, file in enumerate(files):
+            ext = upload_file_extension(file)
+            file.save(os.path.join(input_dir, f'image_{i:04d}.{ext}'))
+    except OSError as e:
+        jobs.discard(job_id)
+        return jsonify({'error': str(e)}), 500
+    
+    jobs.enqueue(job_id)
+    print(f"📥 Job {job_id}: {patient_name}, {len(files)} ảnh")
+    
+    return jsonify({**urls, 'coalesced': False}), 202
+
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job status, progress and (when done) the create_video result"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Không tìm thấy job'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@api.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events with the job state after every update, until it finishes"""
+    jobs = get_job_queue()
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Không tìm thấy job'}), 404
+    
+    def events(job):
+        yield f'data: {json.dumps(job, ensure_ascii=False)}\n\n'
+        while job['status'] not in FINAL_STATUSES:
+            version = job['version']
+            job = jobs.wait_for_change(job_id, version, JOB_EVENT_HEARTBEAT)
+            if job is None:
+                return
+            if job['version'] == version:
+                yield ': keep-alive\n\n'
+            else:
+                yield f'data: {json.dumps(job, ensure_ascii=False)}\n\n'
+    
+    response = Response(stream_with_context(events(job)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until the model is loaded and warmed up"""
+    status = get_warmup().status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Cache counters, job queue, admission and scheduler state"""
+    return jsonify({
+        'decoded_cache': get_decoded_cache().stats(),
+        'detection_cache': get_detection_cache().stats(),
+        'slice_render_cache': get_series_store().stats(),
+        'jobs': get_job_queue().stats(),
+        'admission': get_admission().stats(),
+        'scheduler': get_scheduler().stats()
+    })
+
+
+@api.route('/api/series/<series_id>', methods=['GET'])
+def get_series(series_id):
+    """Get stored series metadata, detections and video export status"""
+    store = get_series_store()
+    if not store.is_valid_id(series_id):
+        return jsonify({'error': 'Series không hợp lệ'}), 400
+    
+    meta = store.get_meta(series_id)
+    if meta is None:
+        return jsonify({'error': 'Không tìm thấy series'}), 404
+    
+    meta['slice_url'] = f'/api/series/{series_id}/slice/{{index}}'
+    meta['window_presets'] = WINDOW_PRESETS
+    return jsonify({'success': True, 'series': meta})
+
+
+@api.route('/api/series/<series_id>/slice/<int:index>', methods=['GET'])
+def get_series_slice(series_id, index):
+    """
+    Render one slice of a stored series
+    
+    Query params: format (jpeg|webp), overlays (1|0), width, quality,
+    plane (axial|coronal|sagittal; reformatted planes need volume storage),
+    window (lung|soft_tissue|bone or center,width; 16-bit series only)
+    """
+    store = get_series_store()
+    fmt = request.args.get('format', 'jpeg').lower()
+    plane = request.args.get('plane', 'axial').lower()
+    if fmt not in SLICE_FORMATS or plane not in SLICE_PLANES or not store.is_valid_id(series_id):
+        return jsonify({'error': 'Tham số không hợp lệ'}), 400
+    try:
+        window = resolve_window(request.args.get('window'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    overlays = request.args.get('overlays', '1').lower() not in ('0', 'false', 'no')
+    width = request.args.get('width', type=int)
+    quality = request.args.get('quality', SLICE_JPEG_QUALITY, type=int)
+    
+    rendered = store.render_slice(
+        series_id, index, fmt, overlays,
+        width=width if width and width > 0 else None,
+        quality=max(1, min(100, quality)),
+        plane=plane,
+        window=window
+    )
+    if rendered is None:
+        return jsonify({'error': 'Không tìm thấy lát cắt'}), 404
+    
+    data, mimetype = rendered
+    response = Response(data, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+@api.route('/api/series/<series_id>/redetect', methods=['POST'])
+def redetect_series(series_id):
+    """
+    Run detection again on the stored slices of a series
+    
+    With a deadline (seconds) slices not analyzed in time are left pending
+    and finished in the background (poll the series for completion).
+    """
+    started = time.perf_counter()
+    store = get_series_store()
+    if not store.is_valid_id(series_id):
+        return jsonify({'error': 'Không tìm thấy series'}), 404
+    try:
+        deadline = _request_deadline(request.get_json(silent=True) or request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    processor = get_video_processor(get_detector(MODEL_PATH))
+    if not processor.detector or not processor.detector.is_loaded():
+        return jsonify({'error': 'Model chưa sẵn sàng'}), 503
+    
+    with get_scheduler().slot('standard'):
+        meta = processor.redetect_series(series_id, _time_left(deadline, started))
+    if meta is None:
+        return jsonify({'error': 'Không tìm thấy series'}), 404
+    if meta['partial']:
+        processor.start_completion(series_id, update_report=False)
+    
+    return jsonify({'success': True, 'series': meta})
+
+
+@api.route('/api/series/<series_id>/export', methods=['POST'])
+def export_series(series_id):
+    """Start rendering the annotated video of a stored series in the background"""
+    store = get_series_store()
+    meta = store.get_meta(series_id) if store.is_valid_id(series_id) else None
+    if meta is None:
+        return jsonify({'error': 'Không tìm thấy series'}), 404
+    if meta['video']['status'] in ('pending', 'running'):
+        return jsonify({'error': 'Video đang được xuất'}), 409
+    
+    options = request.get_json(silent=True) or request.form
+    processor = get_video_processor()
+    processor.start_export(
+        series_id, options.get('codec'), options.get('quality'),
+        _get_form_flag('burn_overlays', options)
+    )
+    
+    return jsonify({
+        'success': True,
+        'status_url': f'/api/series/{series_id}'
+    }), 202
+
+
 @api.route('/api/get_report', methods=['GET'])
 def get_report():
     """Get report for a patient"""
@@ -170,17 +687,21 @@ def get_latest_video():
     try:
         video_files = glob.glob(os.path.join(RESULTS_FOLDER, '*.webm'))
         video_files += glob.glob(os.path.join(RESULTS_FOLDER, '*.mp4'))
+        video_files += glob.glob(os.path.join(RESULTS_FOLDER, '*.avi'))
         
         if not video_files:
             return jsonify({'error': 'Không tìm thấy video nào'}), 404
         
         latest = max(video_files, key=os.path.getctime)
         video_name = os.path.basename(latest)
+        overlay_name = os.path.basename(overlay_track_path(latest))
+        has_overlays = os.path.exists(os.path.join(RESULTS_FOLDER, overlay_name))
         
         return jsonify({
             'success': True,
             'video_url': f'/results/{video_name}',
             'video_name': video_name,
+            'overlay_url': f'/results/{overlay_name}' if has_overlays else None,
             'file_size': os.path.getsize(latest),
             'created_time': datetime.fromtimestamp(
                 os.path.getctime(latest)
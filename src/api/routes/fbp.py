@@ -7,6 +7,9 @@ from PIL import Image
 import io
 import base64
 
+from ..services.admission import AdmissionRejected, get_admission, reconstruction_cost
+from ..services.scheduler import get_scheduler
+
 # Try to import skimage, if not available use our own implementation
 try:
     from skimage.transform import iradon, radon
@@ -234,86 +237,16 @@ def reconstruct():
         num_detectors, num_angles = sinogram_for_iradon.shape
         print(f"[FBP] Using: {num_detectors} detectors x {num_angles} angles (no transpose)")
         
-        # Create theta array - angles in degrees
-        theta = np.linspace(0, angle_range, num_angles, endpoint=False)
-        print(f"[FBP] Theta: {theta[0]:.1f}° to {theta[-1]:.1f}° ({len(theta)} angles)")
-        
-        # Perform FBP reconstruction using scikit-image
-        if HAS_SKIMAGE:
-            # iradon expects sinogram as (n_detectors, n_angles)
-            reconstructed = iradon(sinogram_for_iradon, theta=theta, filter_name=filter_name, circle=True)
-            print(f"[FBP] Reconstruction done: {reconstructed.shape}")
-            print(f"[FBP] Raw result range: {reconstructed.min():.6f} to {reconstructed.max():.6f}")
-            
-            # Create filtered sinogram for visualization
-            # Apply the same filter that iradon uses
-            filtered_sinogram = create_filtered_sinogram(sinogram_for_iradon, filter_name)
-        else:
-            reconstructed = iradon_custom(sinogram_for_iradon, theta=theta, filter_name=filter_name or 'ramp')
-            filtered_sinogram = sinogram_for_iradon  # Fallback
-        
-        # Rotate if needed (sometimes the reconstruction is rotated)
-        # reconstructed = np.rot90(reconstructed, k=1)  # Uncomment if needed
-        
-        # Apply contrast enhancement using percentile-based windowing
-        p_low = np.percentile(reconstructed, 0.5)
-        p_high = np.percentile(reconstructed, 99.5)
-        print(f"[FBP] Percentile 0.5-99.5: {p_low:.6f} to {p_high:.6f}")
-        
-        # Clip to percentile range and normalize
-        reconstructed_clipped = np.clip(reconstructed, p_low, p_high)
-        
-        if p_high > p_low:
-            reconstructed_norm = (reconstructed_clipped - p_low) / (p_high - p_low)
-        else:
-            reconstructed_norm = np.zeros_like(reconstructed)
-        
-        # Apply gamma correction for better visualization
-        gamma = 0.7  # < 1 brightens mid-tones
-        reconstructed_norm = np.power(reconstructed_norm, gamma)
-        
-        # Convert to uint8
-        reconstructed_uint8 = (reconstructed_norm * 255).astype(np.uint8)
-        print(f"[FBP] Final uint8 range: {reconstructed_uint8.min()} to {reconstructed_uint8.max()}")
-        
-        # Resize to requested output size
-        recon_img = Image.fromarray(reconstructed_uint8, mode='L')
-        if output_size != reconstructed_uint8.shape[0]:
-            recon_img = recon_img.resize((output_size, output_size), Image.LANCZOS)
-        
-        # Convert reconstructed image to base64
-        buffer = io.BytesIO()
-        recon_img.save(buffer, format='PNG')
-        recon_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        # Convert filtered sinogram to base64
-        # Normalize filtered sinogram for display
-        fs_min, fs_max = filtered_sinogram.min(), filtered_sinogram.max()
-        if fs_max > fs_min:
-            filtered_norm = (filtered_sinogram - fs_min) / (fs_max - fs_min) * 255
-        else:
-            filtered_norm = np.zeros_like(filtered_sinogram)
-        filtered_uint8 = filtered_norm.astype(np.uint8)
-        filtered_img = Image.fromarray(filtered_uint8, mode='L')
-        
-        buffer2 = io.BytesIO()
-        filtered_img.save(buffer2, format='PNG')
-        filtered_b64 = base64.b64encode(buffer2.getvalue()).decode('utf-8')
-        
-        print(f"[FBP] ✅ Success! Output size: {output_size}x{output_size}")
-        print(f"{'='*50}\n")
-        
-        return jsonify({
-            'success': True,
-            'image': f'data:image/png;base64,{recon_b64}',
-            'filtered_sinogram': f'data:image/png;base64,{filtered_b64}',
-            'size': output_size,
-            'filter': filter_name,
-            'num_angles': num_angles,
-            'num_detectors': num_detectors,
-            'original_shape': f'{h}x{w}'
-        })
+        # Reconstruction work grows with detectors^2 x angles; wait for budget,
+        # then run on an interactive slot so queued video work cannot delay it
+        with get_admission().admit('fbp', reconstruction_cost(num_detectors, num_angles)), \
+                get_scheduler().slot('interactive'):
+            return _reconstruct(sinogram_for_iradon, filter_name, output_size,
+                                angle_range, h, w)
         
+    except AdmissionRejected as e:
+        print(f"[FBP] 🚦 Rejected ({e.reason}), retry after {e.retry_after}s")
+        return jsonify(e.body()), 429, e.headers()
     except Exception as e:
         import traceback
         print(f"[FBP] ❌ Error: {e}")
@@ -323,3 +256,88 @@ def reconstruct():
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
+
+
+def _reconstruct(sinogram_for_iradon, filter_name, output_size, angle_range, h, w):
+    """Run FBP and build the response (called with the admission budget and a slot held)"""
+    num_detectors, num_angles = sinogram_for_iradon.shape
+    
+    # Create theta array - angles in degrees
+    theta = np.linspace(0, angle_range, num_angles, endpoint=False)
+    print(f"[FBP] Theta: {theta[0]:.1f}° to {theta[-1]:.1f}° ({len(theta)} angles)")
+    
+    # Perform FBP reconstruction using scikit-image
+    if HAS_SKIMAGE:
+        # iradon expects sinogram as (n_detectors, n_angles)
+        reconstructed = iradon(sinogram_for_iradon, theta=theta, filter_name=filter_name, circle=True)
+        print(f"[FBP] Reconstruction done: {reconstructed.shape}")
+        print(f"[FBP] Raw result range: {reconstructed.min():.6f} to {reconstructed.max():.6f}")
+        
+        # Create filtered sinogram for visualization
+        # Apply the same filter that iradon uses
+        filtered_sinogram = create_filtered_sinogram(sinogram_for_iradon, filter_name)
+    else:
+        reconstructed = iradon_custom(sinogram_for_iradon, theta=theta, filter_name=filter_name or 'ramp')
+        filtered_sinogram = sinogram_for_iradon  # Fallback
+    
+    # Rotate if needed (sometimes the reconstruction is rotated)
+    # reconstructed = np.rot90(reconstructed, k=1)  # Uncomment if needed
+    
+    # Apply contrast enhancement using percentile-based windowing
+    p_low = np.percentile(reconstructed, 0.5)
+    p_high = np.percentile(reconstructed, 99.5)
+    print(f"[FBP] Percentile 0.5-99.5: {p_low:.6f} to {p_high:.6f}")
+    
+    # Clip to percentile range and normalize
+    reconstructed_clipped = np.clip(reconstructed, p_low, p_high)
+    
+    if p_high > p_low:
+        reconstructed_norm = (reconstructed_clipped - p_low) / (p_high - p_low)
+    else:
+        reconstructed_norm = np.zeros_like(reconstructed)
+    
+    # Apply gamma correction for better visualization
+    gamma = 0.7  # < 1 brightens mid-tones
+    reconstructed_norm = np.power(reconstructed_norm, gamma)
+    
+    # Convert to uint8
+    reconstructed_uint8 = (reconstructed_norm * 255).astype(np.uint8)
+    print(f"[FBP] Final uint8 range: {reconstructed_uint8.min()} to {reconstructed_uint8.max()}")
+    
+    # Resize to requested output size
+    recon_img = Image.fromarray(reconstructed_uint8, mode='L')
+    if output_size != reconstructed_uint8.shape[0]:
+        recon_img = recon_img.resize((output_size, output_size), Image.LANCZOS)
+    
+    # Convert reconstructed image to base64
+    buffer = io.BytesIO()
+    recon_img.save(buffer, format='PNG')
+    recon_b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    
+    # Convert filtered sinogram to base64
+    # Normalize filtered sinogram for display
+    fs_min, fs_max = filtered_sinogram.min(), filtered_sinogram.max()
+    if fs_max > fs_min:
+        filtered_norm = (filtered_sinogram - fs_min) / (fs_max - fs_min) * 255
+    else:
+        filtered_norm = np.zeros_like(filtered_sinogram)
+    filtered_uint8 = filtered_norm.astype(np.uint8)
+    filtered_img = Image.fromarray(filtered_uint8, mode='L')
+    
+    buffer2 = io.BytesIO()
+    filtered_img.save(buffer2, format='PNG')
+    filtered_b64 = base64.b64encode(buffer2.getvalue()).decode('utf-8')
+    
+    print(f"[FBP] ✅ Success! Output size: {output_size}x{output_size}")
+    print(f"{'='*50}\n")
+    
+    return jsonify({
+        'success': True,
+        'image': f'data:image/png;base64,{recon_b64}',
+        'filtered_sinogram': f'data:image/png;base64,{filtered_b64}',
+        'size': output_size,
+        'filter': filter_name,
+        'num_angles': num_angles,
+        'num_detectors': num_detectors,
+        'original_shape': f'{h}x{w}'
+    })
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Batch-process every series under a root folder (e.g. data/dicom_*) into videos and reports.
+Series are processed in a process pool with one model instance per worker. Progress is kept
+in a manifest so an interrupted run can be resumed; finished series are skipped.
+
+Usage:
+  python src/api/scripts/batch_process.py --root data --pattern "dicom_*" --workers 2
+  python src/api/scripts/batch_process.py --root data --retry-failed
+
+Requirements: OpenCV, ultralytics and model/best.pt
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.config import MODEL_PATH, ALLOWED_EXTENSIONS
+from api.services.detector import YOLODetector
+from api.services.video_processor import get_video_processor
+from api.services.report_generator import ReportGenerator
+from api.utils.dicom_utils import find_dicom_files
+from api.utils.file_utils import natural_sort_key
+
+
+# Per-process video processor, created by the pool initializer
+_processor = None
+
+
+def init_worker(model_path):
+    """Load one model per worker process"""
+    global _processor
+
+    detector = YOLODetector(model_path)
+    if not detector.is_loaded():
+        raise RuntimeError(f'Model not available: {model_path}')
+    _processor = get_video_processor(detector)
+
+
+def find_series(root, pattern):
+    """Folders under root matching pattern that contain at least one image"""
+    folders = []
+    for folder in sorted(glob.glob(os.path.join(root, pattern))):
+        if os.path.isdir(folder) and list_images(folder):
+            folders.append(folder)
+    return folders
+
+
+def list_images(folder):
+    """Slice files in a folder: images, .dcm files and extensionless DICOM files"""
+    files = {
+        f for f in glob.glob(os.path.join(folder, '*'))
+        if f.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS
+    }
+    files.update(find_dicom_files(folder))
+    return sorted(files, key=natural_sort_key)
+
+
+def patient_name_from_folder(folder):
+    """'dicom_TRUONG THAI HOA_58T_25039391_309' -> 'TRUONG THAI HOA'"""
+    name = os.path.basename(os.path.normpath(folder))
+    if name.lower().startswith('dicom_'):
+        name = name[len('dicom_'):]
+    return name.split('_')[0] or name
+
+
+def process_series(folder, options):
+    """
+    Process one series folder (runs in a worker process)
+
+    Returns:
+        Manifest entry dictionary
+    """
+    start = time.perf_counter()
+    image_files = list_images(folder)
+    entry = {'slices': len(image_files), 'finished_at': None}
+
+    try:
+        result = _processor.process_images_to_video(
+            image_files, patient_name_from_folder(folder), **options
+        )
+        if not result['success']:
+            raise RuntimeError(result.get('error', 'Unknown error'))
+
+        report, report_path = ReportGenerator.create_report(result)
+        entry.update({
+            'status': 'done',
+            'video': result['video_path'],
+            'series_id': result.get('series_id'),
+            'report': report_path,
+            'tumor_count': result['tumor_count']
+        })
+    except Exception as e:
+        entry.update({'status': 'failed', 'error': str(e)})
+
+    entry['seconds'] = round(time.perf_counter() - start, 2)
+    entry['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    return entry
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    """Write manifest atomically so an interrupted run never leaves it truncated"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--root', required=True, help='Folder containing series folders')
+    p.add_argument('--pattern', default='*', help='Glob for series folders under root (e.g. "dicom_*")')
+    p.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    p.add_argument('--manifest', default=None, help='Manifest path (default: <root>/batch_manifest.json)')
+    p.add_argument('--retry-failed', action='store_true', help='Process series that failed before')
+    p.add_argument('--model', default=MODEL_PATH)
+    p.add_argument('--pixel-spacing', type=float, default=None)
+    p.add_argument('--sampling', choices=['exhaustive', 'adaptive'], default=None)
+    p.add_argument('--crop', choices=['none', 'detect', 'encode'], default=None)
+    p.add_argument('--codec', default=None)
+    p.add_argument('--quality', default=None)
+    p.add_argument('--window', default=None,
+                   help="Window for 16-bit slices: preset (lung, soft_tissue, bone) or 'center,width'")
+    p.add_argument('--export', choices=['inline', 'none'], default=None,
+                   help="'none' keeps slices and detections without rendering video")
+    args = p.parse_args()
+
+    manifest_path = args.manifest or os.path.join(args.root, 'batch_manifest.json')
+    manifest = load_manifest(manifest_path)
+
+    pending = []
+    for folder in find_series(args.root, args.pattern):
+        key = os.path.relpath(folder, args.root)
+        status = manifest.get(key, {}).get('status')
+        if status == 'done' or (status == 'failed' and not args.retry_failed):
+            continue
+        pending.append((key, folder))
+
+    if not pending:
+        print('Nothing to do: all series are in the manifest', manifest_path)
+        return
+
+    # Background export would outlive the worker; only inline or none make sense here
+    options = {
+        'pixel_spacing': args.pixel_spacing,
+        'sampling': args.sampling,
+        'crop': args.crop,
+        'codec': args.codec,
+        'quality': args.quality,
+        'window': args.window,
+        'export': args.export
+    }
+
+    print(f'{len(pending)} series to process with {args.workers} workers '
+          f'(manifest: {manifest_path})')
+
+    start = time.perf_counter()
+    total_slices = 0
+    done = failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.model,)) as pool:
+        futures = {pool.submit(process_series, folder, options): key for key, folder in pending}
+
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                # Worker crashed or the model failed to load
+                entry = {'status': 'failed', 'error': str(e),
+                         'finished_at': datetime.now().isoformat(timespec='seconds')}
+
+            manifest[key] = entry
+            save_manifest(manifest_path, manifest)
+
+            if entry['status'] == 'done':
+                done += 1
+                total_slices += entry['slices']
+                print(f"✅ {key}: {entry['slices']} slices in {entry['seconds']}s, "
+                      f"{entry['tumor_count']} tumors")
+            else:
+                failed += 1
+                print(f"❌ {key}: {entry['error']}")
+
+    elapsed = time.perf_counter() - start
+    print(f'Done: {done} series, failed: {failed}, {total_slices} slices in {elapsed:.1f}s '
+          f'({total_slices / max(elapsed, 1e-9):.1f} slices/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark adaptive (coarse-to-fine) slice sampling against exhaustive detection.
+Runs VideoProcessor twice on the same series with the detection cache disabled,
+then reports timings, inference counts and whether the detections match.
+
+Usage:
+  python src/api/scripts/benchmark_sampling.py --folder "data/dicom_TRUONG THAI HOA_58T_25039391_309" --stride 4 --radius 4
+
+Requirements: OpenCV, ultralytics and model/best.pt
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.config import MODEL_PATH, ALLOWED_EXTENSIONS
+from api.services.detector import YOLODetector
+from api.services.video_processor import VideoProcessor
+from api.utils.file_utils import natural_sort_key
+
+
+def run_once(processor, image_files, **kwargs):
+    start = time.perf_counter()
+    result = processor.process_images_to_video(image_files, 'benchmark', **kwargs)
+    elapsed = time.perf_counter() - start
+
+    # Benchmark outputs are not needed (video, overlay track, snapshots and
+    # the stored series if the processor has a store; no report is written)
+    for path in [result.get('video_path'), result.get('overlay_path')] + result.get('detected_frames', []):
+        if path and os.path.exists(path):
+            os.remove(path)
+    if result.get('series_id') and processor.store is not None:
+        processor.store.delete(result['series_id'])
+
+    return result, elapsed
+
+
+def detections_by_frame(result):
+    return {
+        d['frame_index']: [(b['x1'], b['y1'], b['x2'], b['y2']) for b in d['boxes']]
+        for d in result['detections']
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--folder', required=True, help='Folder with series slices')
+    p.add_argument('--stride', type=int, default=4)
+    p.add_argument('--radius', type=int, default=4)
+    p.add_argument('--model', default=MODEL_PATH)
+    args = p.parse_args()
+
+    # Slice order matters to adaptive sampling: '<uid>.2.png' before '<uid>.10.png'
+    image_files = sorted((
+        f for f in glob.glob(os.path.join(args.folder, '*'))
+        if f.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS
+    ), key=natural_sort_key)
+    if not image_files:
+        print('No images found in', args.folder)
+        sys.exit(1)
+
+    detector = YOLODetector(args.model)
+    if not detector.is_loaded():
+        print('Model not available:', args.model)
+        sys.exit(1)
+
+    processor = VideoProcessor(detector, cache=None)
+    print(f'Series: {len(image_files)} slices')
+
+    exhaustive, t_exhaustive = run_once(
+        processor, image_files, gate_threshold=0, sampling='exhaustive'
+    )
+    adaptive, t_adaptive = run_once(
+        processor, image_files, gate_threshold=0, sampling='adaptive',
+        sample_stride=args.stride, sample_radius=args.radius
+    )
+
+    ex_boxes = detections_by_frame(exhaustive)
+    ad_boxes = detections_by_frame(adaptive)
+    missed = sorted(set(ex_boxes) - set(ad_boxes))
+
+    print(f"Exhaustive: {t_exhaustive:.2f}s, {exhaustive['detection_stats']['inferences']} inferences, "
+          f"{len(ex_boxes)} positive slices")
+    print(f"Adaptive (stride={args.stride}, radius={args.radius}): {t_adaptive:.2f}s, "
+          f"{adaptive['detection_stats']['inferences']} inferences, {len(ad_boxes)} positive slices")
+    print(f'Speedup: {t_exhaustive / t_adaptive:.2f}x')
+
+    if ex_boxes == ad_boxes:
+        print('✅ Detections identical to exhaustive scan')
+    else:
+        print(f'⚠️ Detections differ; missed positive slices: {missed}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,16 +3,24 @@
 Generate detailed JSON report from an existing result video by running YOLO detection on frames.
 Saves report to results/<safe_patient>_<timestamp>_report.json
 
+Frames are streamed from the video in batches, so memory stays flat regardless
+of video length. With --workers N the video is split into N frame ranges that
+are decoded (by seeking) and detected in parallel worker processes, each with
+its own model.
+
 Usage:
   python scripts/generate_report_from_video.py --video results/Phung_Gia_Tho_20251124_112947.webm --patient "Phùng Gia Thọ"
+  python scripts/generate_report_from_video.py --video results/long.webm --patient "A" --workers 4 --batch-size 16
 
 Requirements: OpenCV, numpy, ultralytics (if you want to use the same model)
 """
 import os
 import sys
+import time
 import argparse
 import json
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import cv2
 from werkzeug.utils import secure_filename
 
@@ -23,40 +31,155 @@ except Exception:
     has_ultralytics = False
 
 
-def read_video_frames(video_path, max_frames=None, skip=1):
+def count_video_frames(video_path):
+    """Frame count from the container (0 if unknown)"""
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise RuntimeError(f"Cannot open video: {video_path}")
-    frames = []
-    idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if idx % skip == 0:
-            frames.append((idx, frame))
-            if max_frames and len(frames) >= max_frames:
-                break
-        idx += 1
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
     cap.release()
-    return frames
+    return max(0, count)
+
+
+def iter_video_frames(video_path, start=0, end=None, skip=1):
+    """
+    Yield (frame_index, frame) for every skip-th frame in [start, end)
+
+    Seeks to start; frames that are not sampled are grabbed without being
+    converted. Only one frame is held at a time.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+    try:
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        idx = start
+        while end is None or idx < end:
+            if idx % skip == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield idx, frame
+            elif not cap.grab():
+                break
+            idx += 1
+    finally:
+        cap.release()
+
+
+def iter_batches(frames, batch_size):
+    """Group an iterator of (index, frame) into lists of at most batch_size"""
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_detection_on_batches(model, batches, progress=None):
+    """
+    Run the model on batches of frames
 
+    Args:
+        model: ultralytics YOLO model
+        batches: Iterator of [(frame_index, frame), ...]
+        progress: Optional callback(frames_done) called after each batch
 
-def run_detection_on_frames(model, frames):
+    Returns:
+        Tuple of (detections list, number of frames analysed)
+    """
     results_list = []
-    for idx, frame in frames:
-        # ultralytics YOLO expects ndarray BGR
-        res = model(frame)
-        boxes = []
-        for r in res:
+    analysed = 0
+    for batch in batches:
+        # ultralytics YOLO expects a list of BGR ndarrays for batched inference
+        res = model([frame for _, frame in batch], verbose=False)
+        for (idx, _), r in zip(batch, res):
+            boxes = []
             if hasattr(r, 'boxes'):
                 arr = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, 'xyxy') else []
                 for box in arr:
                     x1, y1, x2, y2 = map(int, box)
                     boxes.append([x1, y1, x2, y2])
-        if boxes:
-            results_list.append({'frame_index': idx, 'boxes': boxes})
-    return results_list
+            if boxes:
+                results_list.append({'frame_index': idx, 'boxes': boxes})
+        analysed += len(batch)
+        if progress:
+            progress(analysed)
+    return results_list, analysed
+
+
+class Progress:
+    """Prints frames done and throughput at most every interval seconds"""
+
+    def __init__(self, label, total=None, interval=2.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = 0.0
+
+    def __call__(self, done, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = now - self.start
+        fps = done / elapsed if elapsed > 0 else 0.0
+        total = f'/{self.total}' if self.total else ''
+        print(f'[{self.label}] {done}{total} frames, {fps:.1f} fps', flush=True)
+
+
+def detect_shard(video_path, model_path, start, end, skip, batch_size, expected=None):
+    """
+    Detect on one frame range (runs in a worker process with its own model)
+
+    Returns:
+        Tuple of (detections, frames analysed, seconds)
+    """
+    began = time.perf_counter()
+    model = YOLO(model_path)
+    progress = Progress(f'{start}-{end}', expected)
+    frames = iter_video_frames(video_path, start, end, skip)
+    detections, analysed = run_detection_on_batches(model, iter_batches(frames, batch_size), progress)
+    progress(analysed, force=True)
+    return detections, analysed, time.perf_counter() - began
+
+
+def shard_ranges(total, workers, skip):
+    """Split [0, total) into up to workers contiguous ranges aligned to skip"""
+    step = -(-total // workers)
+    step += (-step) % skip
+    return [(s, min(total, s + step)) for s in range(0, total, step)]
+
+
+def run_detection_sharded(video_path, model_path, total, workers, skip, batch_size):
+    """
+    Detect across worker processes, one contiguous frame range each
+
+    Returns:
+        Tuple of (detections sorted by frame, frames analysed)
+    """
+    ranges = shard_ranges(total, workers, skip)
+    detections = []
+    analysed = 0
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = {
+            pool.submit(detect_shard, video_path, model_path, s, e, skip, batch_size,
+                        len(range(s, e, skip))): (s, e)
+            for s, e in ranges
+        }
+        for future in as_completed(futures):
+            shard_detections, shard_analysed, seconds = future.result()
+            s, e = futures[future]
+            print(f'Shard {s}-{e} done: {shard_analysed} frames in {seconds:.1f}s')
+            detections.extend(shard_detections)
+            analysed += shard_analysed
+    detections.sort(key=lambda d: d['frame_index'])
+    return detections, analysed
 
 
 def main():
@@ -66,7 +189,12 @@ def main():
     p.add_argument('--max-frames', type=int, default=None)
     p.add_argument('--skip', type=int, default=1, help='Process every N-th frame')
     p.add_argument('--pixel-spacing', type=float, default=None, help='Pixel spacing in mm/pixel to convert sizes to mm')
+    p.add_argument('--model', default='model/best.pt')
+    p.add_argument('--batch-size', type=int, default=8, help='Frames per model call')
+    p.add_argument('--workers', type=int, default=1, help='Worker processes, each detecting one frame range')
     args = p.parse_args()
+    args.skip = max(1, args.skip)
+    args.batch_size = max(1, args.batch_size)
 
     video = args.video
     patient = args.patient
@@ -74,18 +202,39 @@ def main():
         print('Video not found:', video)
         sys.exit(1)
 
-    print('Reading frames from', video)
-    frames = read_video_frames(video, max_frames=args.max_frames, skip=args.skip)
-    print(f'Loaded {len(frames)} frames (sampled every {args.skip} frames)')
+    total = count_video_frames(video)
+    end = args.max_frames * args.skip if args.max_frames else None
+    if total and end:
+        end = min(end, total)
+    print(f'Reading frames from {video} ({total or "unknown"} frames, sampled every {args.skip} frames)')
 
     detected_objects = []
-    if has_ultralytics and os.path.exists('model/best.pt'):
-        print('Loading YOLO model...')
-        model = YOLO('model/best.pt')
-        detected_objects = run_detection_on_frames(model, frames)
-        print('Detections on frames:', len(detected_objects))
+    frame_count = 0
+    started = time.perf_counter()
+    if has_ultralytics and os.path.exists(args.model):
+        # Sharding needs a known length to split; otherwise stream in one process
+        shard_total = end or total
+        if args.workers > 1 and shard_total:
+            print(f'Detecting in {args.workers} worker processes...')
+            detected_objects, frame_count = run_detection_sharded(
+                video, args.model, shard_total, args.workers, args.skip, args.batch_size
+            )
+        else:
+            print('Loading YOLO model...')
+            model = YOLO(args.model)
+            expected = len(range(0, shard_total, args.skip)) if shard_total else None
+            progress = Progress('detect', expected)
+            frames = iter_video_frames(video, 0, end, args.skip)
+            detected_objects, frame_count = run_detection_on_batches(
+                model, iter_batches(frames, args.batch_size), progress
+            )
+            progress(frame_count, force=True)
+        elapsed = time.perf_counter() - started
+        print(f'Detections on frames: {len(detected_objects)} '
+              f'({frame_count} frames in {elapsed:.1f}s, {frame_count / max(elapsed, 1e-9):.1f} fps)')
     else:
         print('Ultralytics or model not available; skipping model detection.')
+        frame_count = sum(1 for _ in iter_video_frames(video, 0, end, args.skip))
 
     # Compute detection sizes
     detections_details = []
@@ -117,7 +266,7 @@ def main():
         f'Bệnh nhân: {patient}',
         f'Thời gian tạo báo cáo: {timestamp}',
         f'Video nguồn: {video}',
-        f'Tổng số frames được phân tích: {len(frames)}',
+        f'Tổng số frames được phân tích: {frame_count}',
         ''
     ]
     if tumor_count > 0:
@@ -137,7 +286,7 @@ def main():
         'timestamp': timestamp,
         'video_url': f'/results/{video_name}',
         'video_name': video_name,
-        'frame_count': len(frames),
+        'frame_count': frame_count,
         'detected_frames': [],
         'detections': detections_details,
         'tumor_count': tumor_count,
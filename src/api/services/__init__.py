@@ -2,3 +2,8 @@
 from .detector import YOLODetector, get_detector
 from .video_processor import VideoProcessor, get_video_processor
 from .report_generator import ReportGenerator
+from .detection_cache import DetectionCache, get_detection_cache
+from .warmup import ModelWarmup, get_warmup
+from .series_store import SeriesStore, get_series_store
+from .publisher import publish_result
+from .job_queue import JobQueue, get_job_queue
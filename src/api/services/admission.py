@@ -0,0 +1,182 @@
+"""
+Admission Control Service
+Limits the estimated cost of heavy requests running at once, per endpoint.
+Requests over budget wait in a bounded FIFO queue; beyond it they are
+rejected so the client can retry later (HTTP 429 with Retry-After).
+"""
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from ..config import ADMISSION_POOLS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or waited too long)"""
+
+    def __init__(self, pool, reason, retry_after):
+        super().__init__(f'{pool}: {reason}')
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def body(self):
+        """JSON body for the 429 response"""
+        return {
+            'success': False,
+            'error': 'Máy chủ đang bận, vui lòng thử lại sau',
+            'reason': self.reason,
+            'retry_after': self.retry_after
+        }
+
+    def headers(self):
+        """Headers for the 429 response"""
+        return {'Retry-After': str(self.retry_after)}
+
+
+class _Pool:
+    """Budget, wait queue and counters of one endpoint"""
+
+    def __init__(self, name, budget, max_queue, max_wait):
+        self.name = name
+        self.budget = budget
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_use = 0.0
+        self.active = 0
+        self.waiting = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.hold_seconds = None  # Moving average of time requests hold the budget
+
+
+class AdmissionController:
+    """Cost-based concurrency limiter with per-endpoint budgets"""
+
+    def __init__(self, pools=ADMISSION_POOLS):
+        """
+        Initialize controller
+
+        Args:
+            pools: Dictionary name -> {'budget', 'max_queue', 'max_wait'};
+                budget is in the endpoint's own cost units
+        """
+        self._pools = {name: _Pool(name, **settings) for name, settings in pools.items()}
+        self._changed = threading.Condition()
+
+    def _retry_after(self, pool):
+        """Estimate seconds until a new request could be admitted (caller holds the lock)"""
+        hold = pool.hold_seconds if pool.hold_seconds is not None else 5.0
+        seconds = hold * (len(pool.waiting) + 1) / max(1, pool.active)
+        return int(min(300, max(1, math.ceil(seconds))))
+
+    @contextmanager
+    def admit(self, name, cost, blocking=False):
+        """
+        Hold part of an endpoint's budget while the block runs
+
+        Requests are admitted in arrival order. A request costing more than
+        the whole budget is clamped to it, so it runs alone.
+
+        Args:
+            name: Pool name
+            cost: Estimated cost in the pool's units
+            blocking: Wait without timeout or queue bound (background workers)
+
+        Raises:
+            AdmissionRejected: If the queue is full or max_wait expires
+        """
+        pool = self._pools[name]
+        cost = min(max(float(cost), 0.0), pool.budget)
+        start = time.perf_counter()
+
+        with self._changed:
+            if pool.waiting or pool.in_use + cost > pool.budget:
+                if not blocking and len(pool.waiting) >= pool.max_queue:
+                    pool.rejected += 1
+                    raise AdmissionRejected(name, 'queue full', self._retry_after(pool))
+
+                ticket = object()
+                pool.waiting.append(ticket)
+                pool.queued += 1
+                admitted = self._changed.wait_for(
+                    lambda: pool.waiting[0] is ticket and pool.in_use + cost <= pool.budget,
+                    None if blocking else pool.max_wait
+                )
+                pool.waiting.remove(ticket)
+                if not admitted:
+                    pool.timeouts += 1
+                    self._changed.notify_all()
+                    raise AdmissionRejected(name, 'wait timeout', self._retry_after(pool))
+
+            pool.in_use += cost
+            pool.active += 1
+            pool.admitted += 1
+            pool.wait_seconds += time.perf_counter() - start
+            # The next request in line may fit in what is left
+            self._changed.notify_all()
+
+        held_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - held_at
+            with self._changed:
+                pool.in_use -= cost
+                pool.active -= 1
+                pool.hold_seconds = held if pool.hold_seconds is None else (
+                    0.8 * pool.hold_seconds + 0.2 * held
+                )
+                self._changed.notify_all()
+
+    def stats(self):
+        """Get budget usage, queue length and counters per pool"""
+        with self._changed:
+            return {
+                pool.name: {
+                    'budget': pool.budget,
+                    'in_use': round(pool.in_use, 2),
+                    'active': pool.active,
+                    'waiting': len(pool.waiting),
+                    'max_queue': pool.max_queue,
+                    'admitted': pool.admitted,
+                    'queued': pool.queued,
+                    'rejected': pool.rejected,
+                    'timeouts': pool.timeouts,
+                    'avg_wait_ms': round(pool.wait_seconds * 1000 / max(1, pool.admitted), 1),
+                    'avg_hold_s': round(pool.hold_seconds, 2) if pool.hold_seconds is not None else None
+                }
+                for pool in self._pools.values()
+            }
+
+
+def series_cost(slice_count, width, height):
+    """create_video cost: megapixels to decode, detect and encode"""
+    return slice_count * width * height / 1e6
+
+
+def reconstruction_cost(num_detectors, num_angles):
+    """FBP cost: backprojection work in millions of pixel-angle updates"""
+    return num_detectors * num_detectors * num_angles / 1e6
+
+
+# Global controller instance (lazy initialization)
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission():
+    """Get or create global admission controller instance"""
+    global _admission
+
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = AdmissionController()
+
+    return _admission
@@ -0,0 +1,112 @@
+"""
+Body Crop Service
+Finds a series-wide patient body bounding box so black borders can be
+cropped away before detection and encoding
+"""
+import cv2
+import numpy as np
+
+from ..config import BODY_CROP_THRESHOLD, BODY_CROP_MARGIN
+
+
+def _to_gray8(frame):
+    """Convert a decoded slice to single-channel uint8"""
+    if frame.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        frame = cv2.cvtColor(frame, code)
+    if frame.dtype != np.uint8:
+        frame = cv2.convertScaleAbs(frame, alpha=255.0 / max(1, int(frame.max())))
+    return frame
+
+
+def body_bbox(frame, threshold=BODY_CROP_THRESHOLD):
+    """
+    Find the bounding box of the largest bright region in a slice
+
+    Args:
+        frame: Decoded image array
+        threshold: Intensity (0-255) separating body from background
+
+    Returns:
+        Tuple (x1, y1, x2, y2) or None if nothing found
+    """
+    gray = _to_gray8(frame)
+    _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)
+
+    # Opening removes noise and thin structures, closing fills the lungs
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    return x, y, x + w, y + h
+
+
+def compute_series_bbox(frames, margin=BODY_CROP_MARGIN, even=False):
+    """
+    Compute the union body bounding box over sampled slices
+
+    Args:
+        frames: Iterable of decoded slices (same size)
+        margin: Padding in pixels added around the union box
+        even: Round width/height down to even numbers (needed by some encoders)
+
+    Returns:
+        Tuple (x, y, w, h) or None if no body was found
+    """
+    union = None
+    height = width = 0
+
+    for frame in frames:
+        if frame is None:
+            continue
+        height, width = frame.shape[:2]
+        box = body_bbox(frame)
+        if box is None:
+            continue
+        if union is None:
+            union = list(box)
+        else:
+            union = [min(union[0], box[0]), min(union[1], box[1]),
+                     max(union[2], box[2]), max(union[3], box[3])]
+
+    if union is None:
+        return None
+
+    x1 = max(0, union[0] - margin)
+    y1 = max(0, union[1] - margin)
+    x2 = min(width, union[2] + margin)
+    y2 = min(height, union[3] + margin)
+    w, h = x2 - x1, y2 - y1
+
+    if even:
+        w -= w % 2
+        h -= h % 2
+
+    if w <= 0 or h <= 0:
+        return None
+    return x1, y1, w, h
+
+
+def offset_detections(detections, dx, dy):
+    """
+    Translate detection boxes by (dx, dy) in place
+
+    Args:
+        detections: List of detections with x1/y1/x2/y2
+        dx: Horizontal offset
+        dy: Vertical offset
+
+    Returns:
+        The same list, for chaining
+    """
+    for det in detections:
+        det['x1'] += dx
+        det['x2'] += dx
+        det['y1'] += dy
+        det['y2'] += dy
+    return detections
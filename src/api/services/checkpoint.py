@@ -0,0 +1,85 @@
+"""
+Series Checkpoint Service
+Saves the progress of a series run at chunk boundaries so a run that was
+interrupted (e.g. by a restart) continues from the last completed chunk
+"""
+import os
+import json
+import shutil
+import hashlib
+
+from ..utils.file_utils import image_source_name
+
+
+class SeriesCheckpoint:
+    """Progress file and encoded video segments of one series run"""
+
+    def __init__(self, folder, signature):
+        """
+        Initialize checkpoint
+
+        Args:
+            folder: Folder owned by the run (created on first save)
+            signature: Run signature from make_signature(); a saved
+                checkpoint with another signature is ignored
+        """
+        self.folder = folder
+        self.signature = signature
+
+    @staticmethod
+    def make_signature(sources, params):
+        """
+        Build a run signature from the slice names and run parameters
+
+        Args:
+            sources: Sorted slice sources (paths or MemoryImage objects)
+            params: JSON-serializable parameters that change the output
+
+        Returns:
+            Hex digest string
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        for source in sources:
+            digest.update(image_source_name(source).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, 'checkpoint.json')
+
+    @property
+    def segment_dir(self):
+        """Folder for encoded video segments that survive the run"""
+        return os.path.join(self.folder, 'segments')
+
+    def load(self):
+        """
+        Get the saved progress of an earlier run with the same signature
+
+        Returns:
+            State dictionary passed to save(), or None to start over
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('signature') != self.signature:
+            return None
+        if not all(os.path.exists(path) for path in state.get('segments', [])):
+            return None
+        return state
+
+    def save(self, state):
+        """Write the progress atomically"""
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**state, 'signature': self.signature}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Delete the progress and segments once the run has finished"""
+        shutil.rmtree(self.folder, ignore_errors=True)
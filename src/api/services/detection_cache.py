@@ -0,0 +1,146 @@
+"""
+Detection Cache Service
+Caches YOLO detections by slice content so repeated series skip inference
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ..config import DETECTION_CACHE_FOLDER, DETECTION_CACHE_SIZE
+
+
+class DetectionCache:
+    """Two-level detection cache: in-process LRU backed by JSON files on disk"""
+
+    def __init__(self, cache_dir=DETECTION_CACHE_FOLDER, max_entries=DETECTION_CACHE_SIZE):
+        """
+        Initialize detection cache
+
+        Args:
+            cache_dir: Folder for persistent entries (None disables disk store)
+            max_entries: Maximum number of entries kept in memory
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(frame, signature):
+        """
+        Build cache key from decoded slice pixels and detector signature
+
+        Args:
+            frame: Decoded image array
+            signature: Detector signature (model version + thresholds)
+
+        Returns:
+            Hex digest string
+        """
+        frame = np.ascontiguousarray(frame)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(signature.encode('utf-8'))
+        digest.update(f'{frame.shape}:{frame.dtype.str}'.encode('utf-8'))
+        digest.update(frame.data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        """Get on-disk path for a cache key"""
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _remember(self, key, detections):
+        """Insert entry into the in-memory LRU (caller holds the lock)"""
+        self._entries[key] = detections
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up cached detections
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Copy of cached detection list, or None on miss
+        """
+        with self._lock:
+            detections = self._entries.get(key)
+            if detections is not None:
+                self._entries.move_to_end(key)
+
+        if detections is None and self.cache_dir:
+            try:
+                with open(self._entry_path(key), 'r', encoding='utf-8') as f:
+                    detections = json.load(f)
+                with self._lock:
+                    self._remember(key, detections)
+            except (OSError, ValueError):
+                detections = None
+
+        with self._lock:
+            if detections is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return [dict(det) for det in detections]
+
+    def put(self, key, detections):
+        """
+        Store detections for a key
+
+        Args:
+            key: Cache key from make_key()
+            detections: Detection list from the detector
+        """
+        detections = [dict(det) for det in detections]
+
+        with self._lock:
+            self._remember(key, detections)
+
+        if not self.cache_dir:
+            return
+
+        path = self._entry_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(detections, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Không thể ghi cache detection: {e}")
+
+    def stats(self):
+        """Get hit/miss counters"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._entries)
+            }
+
+
+# Global cache instance (lazy initialization)
+_cache = None
+
+
+def get_detection_cache():
+    """Get or create global detection cache instance"""
+    global _cache
+
+    if _cache is None:
+        _cache = DetectionCache()
+
+    return _cache
@@ -2,7 +2,14 @@
 YOLO Tumor Detection Service
 """
 import os
+import time
+import hashlib
+import threading
 import cv2
+import numpy as np
+
+from ..config import DETECTION_CONF, DETECTION_IOU
+from ..utils.file_utils import to_bgr8
 
 # Monkeypatch torch.load for PyTorch 2.6+ compatibility
 try:
@@ -21,15 +28,20 @@ except Exception as e:
 class YOLODetector:
     """YOLO-based tumor detection service"""
     
-    def __init__(self, model_path):
+    def __init__(self, model_path, conf=DETECTION_CONF, iou=DETECTION_IOU):
         """
         Initialize YOLO detector
         
         Args:
             model_path: Path to YOLO model file (.pt)
+            conf: Confidence threshold
+            iou: NMS IoU threshold
         """
         self.model = None
         self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+        self._signature = None
         self._load_model()
     
     def _load_model(self):
@@ -51,12 +63,93 @@ class YOLODetector:
         """Check if model is loaded"""
         return self.model is not None
     
+    def warmup(self, sizes, runs=1):
+        """
+        Run dummy inferences so lazy initialization happens before real work
+        
+        Args:
+            sizes: List of (width, height) slice sizes to warm up
+            runs: Number of inferences per size
+            
+        Returns:
+            List of timing dictionaries
+        """
+        timings = []
+        if not self.is_loaded():
+            return timings
+        
+        for width, height in sizes:
+            dummy = np.zeros((height, width), dtype=np.uint8)
+            for run in range(runs):
+                start = time.perf_counter()
+                self.predict(dummy)
+                timings.append({
+                    'size': [width, height],
+                    'run': run,
+                    'ms': round((time.perf_counter() - start) * 1000, 1)
+                })
+        
+        return timings
+    
+    def cache_signature(self):
+        """
+        Get a string identifying the model weights and thresholds
+        
+        Used as part of detection cache keys so cached results are
+        invalidated when the model file or thresholds change.
+        
+        Returns:
+            Signature string
+        """
+        if self._signature is None:
+            digest = hashlib.sha1()
+            try:
+                with open(self.model_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+            except OSError:
+                digest.update(self.model_path.encode('utf-8'))
+            self._signature = f'{digest.hexdigest()}:conf={self.conf}:iou={self.iou}'
+        return self._signature
+    
+    def predict(self, frame, verbose=False):
+        """
+        Run the model on a single frame
+        
+        Unlike detect(), errors are raised to the caller. Grayscale and
+        16-bit slices are converted to 8-bit BGR only here, at the model
+        boundary.
+        
+        Args:
+            frame: Image array (grayscale or BGR)
+            verbose: Whether to show detection logs
+            
+        Returns:
+            List of detection results with boxes
+        """
+        results = self.model(to_bgr8(frame), conf=self.conf, iou=self.iou, verbose=verbose)
+        detections = []
+        
+        for r in results:
+            boxes = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, 'xyxy') else []
+            for box in boxes:
+                x1, y1, x2, y2 = map(int, box)
+                detections.append({
+                    'x1': x1, 'y1': y1, 
+                    'x2': x2, 'y2': y2,
+                    'width_px': x2 - x1,
+                    'height_px': y2 - y1,
+                    'area_px': (x2 - x1) * (y2 - y1)
+                })
+        
+        return detections
+    
     def detect(self, frame, verbose=False):
         """
         Detect tumors in a single frame
         
         Args:
-            frame: Image array (BGR)
+            frame: Image array (grayscale or BGR)
             verbose: Whether to show detection logs
             
         Returns:
@@ -66,32 +159,41 @@ class YOLODetector:
             return []
             
         try:
-            results = self.model(frame, verbose=verbose)
-            detections = []
-            
-            for r in results:
-                boxes = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, 'xyxy') else []
-                for box in boxes:
-                    x1, y1, x2, y2 = map(int, box)
-                    detections.append({
-                        'x1': x1, 'y1': y1, 
-                        'x2': x2, 'y2': y2,
-                        'width_px': x2 - x1,
-                        'height_px': y2 - y1,
-                        'area_px': (x2 - x1) * (y2 - y1)
-                    })
-            
-            return detections
+            return self.predict(frame, verbose=verbose)
         except Exception as e:
             print(f'⚠️ Detection error: {e}')
             return []
     
+    @staticmethod
+    def draw_detections(frame, detections):
+        """
+        Draw bounding boxes on a BGR copy of frame
+        
+        Args:
+            frame: Image array (grayscale or BGR)
+            detections: List of detections from detect()
+            
+        Returns:
+            Annotated 8-bit BGR frame
+        """
+        annotated = to_bgr8(frame)
+        if annotated is frame:
+            annotated = frame.copy()
+        
+        for det in detections:
+            x1, y1, x2, y2 = det['x1'], det['y1'], det['x2'], det['y2']
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(annotated, 'Tumor', (x1, y1-10), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+        
+        return annotated
+    
     def detect_and_draw(self, frame, verbose=False):
         """
         Detect tumors and draw bounding boxes on frame
         
         Args:
-            frame: Image array (BGR)
+            frame: Image array (grayscale or BGR)
             verbose: Whether to show detection logs
             
         Returns:
@@ -99,45 +201,22 @@ class YOLODetector:
         """
         if not self.is_loaded():
             return frame, []
-            
-        try:
-            results = self.model(frame, verbose=verbose)
-            detections = []
-            annotated = frame.copy()
-            
-            for r in results:
-                boxes = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, 'xyxy') else []
-                for box in boxes:
-                    x1, y1, x2, y2 = map(int, box)
-                    
-                    # Draw bounding box
-                    cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    cv2.putText(annotated, 'Tumor', (x1, y1-10), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                    
-                    detections.append({
-                        'x1': x1, 'y1': y1,
-                        'x2': x2, 'y2': y2,
-                        'width_px': x2 - x1,
-                        'height_px': y2 - y1,
-                        'area_px': (x2 - x1) * (y2 - y1)
-                    })
-            
-            return annotated, detections
-        except Exception as e:
-            print(f'⚠️ Detection error: {e}')
-            return frame, []
+        
+        detections = self.detect(frame, verbose=verbose)
+        return self.draw_detections(frame, detections), detections
 
 
 # Global detector instance (lazy initialization)
 _detector = None
+_detector_lock = threading.Lock()
 
 
 def get_detector(model_path=None):
     """Get or create global detector instance"""
     global _detector
     
-    if _detector is None and model_path:
-        _detector = YOLODetector(model_path)
+    with _detector_lock:
+        if _detector is None and model_path:
+            _detector = YOLODetector(model_path)
     
     return _detector
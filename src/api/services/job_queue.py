@@ -0,0 +1,475 @@
+"""
+Job Queue Service
+Runs series processing asynchronously on a bounded worker pool. Jobs and
+their uploaded slices are persisted so queued work survives a restart.
+Submissions carrying the same idempotency key attach to one job.
+"""
+import os
+import re
+import json
+import math
+import time
+import queue
+import uuid
+import itertools
+import shutil
+import threading
+from datetime import datetime
+
+from ..config import JOBS_FOLDER, JOB_WORKERS, JOB_IDEMPOTENCY_TTL, MODEL_PATH
+from ..utils.file_utils import image_resolution
+from .admission import get_admission, series_cost
+from .scheduler import PRIORITY_CLASSES, get_scheduler
+from .detector import get_detector
+from .video_processor import get_video_processor
+from .publisher import publish_result
+
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Job statuses: created (inputs still being written), queued, running, done, failed
+FINAL_STATUSES = ('done', 'failed')
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class JobQueue:
+    """Persistent job queue with progress tracking, FIFO within a priority class"""
+
+    def __init__(self, root=JOBS_FOLDER, workers=JOB_WORKERS, ttl=JOB_IDEMPOTENCY_TTL):
+        """
+        Initialize job queue (workers start with start())
+
+        Args:
+            root: Folder holding one sub-folder per job
+            workers: Number of worker threads
+            ttl: Seconds finished jobs (and their keys) are kept
+        """
+        self.root = root
+        self.workers = workers
+        self.ttl = ttl
+        self._pruned_at = 0.0
+        self._jobs = {}
+        self._keys = {}
+        self._handlers = {}
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._changed = threading.Condition()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._job_seconds = None  # Moving average of job run time
+
+    def register(self, kind, handler):
+        """
+        Register the function running jobs of a kind
+
+        Args:
+            kind: Job kind name
+            handler: Callable (job, progress) -> result dictionary, where
+                progress(stage, done=None, total=None) reports progress
+        """
+        self._handlers[kind] = handler
+
+    @staticmethod
+    def is_valid_id(job_id):
+        """Check that a job id is safe to use as a folder name"""
+        return bool(JOB_ID_PATTERN.match(job_id or ''))
+
+    def job_dir(self, job_id):
+        """Get folder of a job"""
+        return os.path.join(self.root, job_id)
+
+    def input_dir(self, job_id):
+        """Get folder holding the uploaded inputs of a job"""
+        return os.path.join(self.job_dir(job_id), 'inputs')
+
+    def work_dir(self, job_id):
+        """
+        Get scratch folder of a job (e.g. checkpoints)
+
+        It survives a restart, so a requeued job can continue from what is
+        saved there, and is removed once the job is done or failed.
+        """
+        return os.path.join(self.job_dir(job_id), 'work')
+
+    def _save(self, job):
+        """Write job.json atomically (caller holds the lock)"""
+        path = os.path.join(self.job_dir(job['id']), 'job.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id, persist=True, **fields):
+        """Update job fields, persist them and wake up event listeners"""
+        with self._changed:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job['version'] += 1
+            if persist:
+                self._save(job)
+            self._changed.notify_all()
+            return dict(job)
+
+    def _expired(self, job):
+        """Check if a job finished more than ttl seconds ago"""
+        if not job['finished_at']:
+            return False
+        age = datetime.now() - datetime.fromisoformat(job['finished_at'])
+        return age.total_seconds() > self.ttl
+
+    def _find_key(self, key):
+        """
+        Get the job id a key is attached to (caller holds the lock)
+
+        Failed jobs and jobs finished more than ttl seconds ago no longer
+        match, so their submissions run again.
+        """
+        job = self._jobs.get(self._keys.get(key))
+        if job is None or job['status'] == 'failed' or self._expired(job):
+            return None
+        return job['id']
+
+    def prune(self, force=False):
+        """
+        Delete jobs finished more than ttl seconds ago, with their keys and
+        folders (checked at most once a minute unless forced)
+
+        Returns:
+            Number of jobs deleted
+        """
+        with self._changed:
+            if not force and time.monotonic() - self._pruned_at < 60:
+                return 0
+            self._pruned_at = time.monotonic()
+            expired = [job_id for job_id, job in self._jobs.items() if self._expired(job)]
+            for job_id in expired:
+                self._jobs.pop(job_id)
+            for key in [k for k, job_id in self._keys.items() if job_id not in self._jobs]:
+                del self._keys[key]
+
+        for job_id in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if expired:
+            print(f"🧹 Đã xóa {len(expired)} job hết hạn")
+        return len(expired)
+
+    def create(self, kind, params, key=None, inline=False):
+        """
+        Create a job, or attach to the existing job with the same key
+
+        Queued jobs get their inputs written to input_dir(job_id) and are
+        then passed to enqueue(); inline jobs are run with run_inline().
+
+        Args:
+            kind: Registered job kind
+            params: JSON-serializable job parameters
+            key: Optional idempotency key
+            inline: Job runs in the caller's thread (not resumed on restart)
+
+        Returns:
+            Tuple of (job id, created) where created is False if the key
+            matched an in-flight or recently completed job
+        """
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        self.prune()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'created',
+            'inline': inline,
+            'idempotency_key': key,
+            'keys': [],
+            'params': params,
+            'progress': {'stage': 'created', 'done': 0, 'total': None},
+            'result': None,
+            'error': None,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'attempts': 0,
+            'version': 0
+        }
+        with self._changed:
+            existing = self._find_key(key) if key else None
+            if existing is not None:
+                return existing, False
+            os.makedirs(self.input_dir(job_id) if not inline else self.job_dir(job_id),
+                        exist_ok=True)
+            self._jobs[job_id] = job
+            if key:
+                self._keys[key] = job_id
+            self._save(job)
+        return job_id, True
+
+    def add_key(self, job_id, key):
+        """
+        Attach another idempotency key to a job (e.g. a content key that is
+        only known once a streamed upload has been read); it is persisted
+        with the job
+
+        Returns:
+            Id of the job owning the key: job_id, or another job that
+            already has it
+        """
+        with self._changed:
+            existing = self._find_key(key)
+            if existing is not None:
+                return existing
+            self._keys[key] = job_id
+            job = self._jobs[job_id]
+            job['keys'] = job.get('keys', []) + [key]
+            self._save(job)
+            return job_id
+
+    def enqueue(self, job_id):
+        """Queue a created job once its inputs are complete"""
+        job = self._update(job_id, status='queued',
+                           progress={'stage': 'queued', 'done': 0, 'total': None})
+        # Standard jobs are picked up before batch backfills queued earlier
+        rank = PRIORITY_CLASSES.index(job['params'].get('priority', 'standard'))
+        self._queue.put((rank, next(self._sequence), job_id))
+
+    def discard(self, job_id):
+        """Delete a job that never got queued (e.g. upload failed)"""
+        with self._changed:
+            self._jobs.pop(job_id, None)
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def get(self, job_id):
+        """
+        Get a job snapshot
+
+        Returns:
+            Job dictionary or None if unknown
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until a job is done or failed
+
+        Returns:
+            Final job snapshot (or the current one on timeout), None if unknown
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs
+                or self._jobs[job_id]['status'] in FINAL_STATUSES,
+                timeout
+            )
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait_for_change(self, job_id, version, timeout):
+        """
+        Block until a job is updated past a version or the timeout expires
+
+        Args:
+            job_id: Job id
+            version: Last version seen by the caller
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Current job snapshot (unchanged on timeout), or None if unknown
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]['version'] > version,
+                timeout
+            )
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def start(self):
+        """Reload persisted jobs, requeue unfinished ones and start workers (once)"""
+        with self._start_lock:
+            if not self._threads:
+                self._start()
+
+    def _start(self):
+        """Body of start() (caller holds the start lock)"""
+        os.makedirs(self.root, exist_ok=True)
+
+        pending = []
+        for job_id in os.listdir(self.root):
+            path = os.path.join(self.root, job_id, 'job.json')
+            if not self.is_valid_id(job_id) or not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if self._expired(job):
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+                continue
+            self._jobs[job_id] = job
+            for key in [job.get('idempotency_key')] + job.get('keys', []):
+                if key:
+                    self._keys[key] = job_id
+
+            if job['status'] == 'created':
+                # Upload was cut off by the restart
+                self._update(job_id, status='failed', error='Upload interrupted',
+                             finished_at=_now())
+            elif job['status'] == 'running' and job.get('inline'):
+                # Inputs of inline jobs lived in the interrupted request
+                self._update(job_id, status='failed', error='Server restarted',
+                             finished_at=_now())
+            elif job['status'] in ('queued', 'running'):
+                pending.append(job)
+
+        for job in sorted(pending, key=lambda j: j['created_at']):
+            print(f"♻️ Khôi phục job {job['id']} ({job['status']})")
+            self.enqueue(job['id'])
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        """Worker loop: run queued jobs one at a time"""
+        while True:
+            _, _, job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        """Run one queued job with its registered handler"""
+        job = self.get(job_id)
+        if job is None or job['status'] != 'queued':
+            return
+
+        handler = self._handlers[job['kind']]
+        job = self._execute(job_id, lambda progress: handler(job, progress))
+        shutil.rmtree(self.work_dir(job_id), ignore_errors=True)
+        if job['status'] == 'done':
+            shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+
+    def run_inline(self, job_id, run):
+        """
+        Run a created inline job in the calling thread
+
+        Args:
+            job_id: Job id from create(..., inline=True)
+            run: Callable (progress) -> result dictionary
+
+        Returns:
+            Final job snapshot
+        """
+        return self._execute(job_id, run)
+
+    def _execute(self, job_id, run):
+        """Track a job through running to done/failed, returning its final snapshot"""
+        job = self.get(job_id)
+        self._update(job_id, status='running', started_at=_now(),
+                     attempts=job['attempts'] + 1,
+                     progress={'stage': 'starting', 'done': 0, 'total': None})
+        last_stage = ['starting']
+
+        def progress(stage, done=None, total=None):
+            # Per-frame updates only notify listeners; stage changes are persisted
+            persist = stage != last_stage[0]
+            last_stage[0] = stage
+            self._update(job_id, persist=persist,
+                         progress={'stage': stage, 'done': done, 'total': total})
+
+        start = time.perf_counter()
+        try:
+            result = run(progress)
+        except Exception as e:
+            print(f"❌ Job {job_id} thất bại: {e}")
+            return self._update(job_id, status='failed', error=str(e), finished_at=_now(),
+                                progress={'stage': 'failed', 'done': None, 'total': None})
+
+        seconds = time.perf_counter() - start
+        with self._changed:
+            self._job_seconds = seconds if self._job_seconds is None else (
+                0.8 * self._job_seconds + 0.2 * seconds
+            )
+        return self._update(job_id, status='done', result=result, finished_at=_now(),
+                            seconds=round(seconds, 2),
+                            progress={'stage': 'done', 'done': None, 'total': None})
+
+    def retry_after(self):
+        """Estimate seconds until the queued jobs have been worked off"""
+        with self._changed:
+            seconds = self._job_seconds if self._job_seconds is not None else 30.0
+        queued = self._queue.qsize()
+        return int(min(3600, max(1, math.ceil(seconds * (queued + 1) / self.workers))))
+
+    def stats(self):
+        """Get job counts by status"""
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {'workers': self.workers, 'queued': self._queue.qsize(), 'jobs': counts,
+                    'idempotency_keys': len(self._keys)}
+
+
+def run_create_video_job(job, progress):
+    """
+    Job handler for create_video: process the uploaded slices and publish
+
+    Args:
+        job: Job snapshot; params hold patient_name, pixel_spacing, priority, options
+        progress: Progress callback
+
+    Returns:
+        Response dictionary (same as /api/create_video)
+    """
+    params = job['params']
+    jobs = get_job_queue()
+    input_dir = jobs.input_dir(job['id'])
+    image_files = [os.path.join(input_dir, name) for name in os.listdir(input_dir)]
+
+    # Workers share the create_video budget with inline requests but wait
+    # for it instead of being rejected
+    width, height = image_resolution(image_files[0]) if image_files else (0, 0)
+    progress('admission')
+    with get_admission().admit('create_video', series_cost(len(image_files), width, height),
+                               blocking=True), \
+            get_scheduler().slot(params.get('priority', 'standard')):
+        processor = get_video_processor(get_detector(MODEL_PATH))
+        # A job requeued after a restart continues from its last checkpoint
+        result = processor.process_images_to_video(
+            image_files, params['patient_name'], params.get('pixel_spacing'),
+            progress=progress, checkpoint_dir=jobs.work_dir(job['id']),
+            **params.get('options', {})
+        )
+    if not result['success']:
+        raise RuntimeError(result.get('error', 'Unknown error'))
+
+    progress('publishing')
+    return publish_result(result, params['patient_name'])
+
+
+# Global job queue instance (lazy initialization)
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Get or create global job queue instance"""
+    global _job_queue
+
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                job_queue = JobQueue()
+                job_queue.register('create_video', run_create_video_job)
+                _job_queue = job_queue
+
+    return _job_queue
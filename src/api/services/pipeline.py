@@ -0,0 +1,153 @@
+"""
+Frame Pipeline Helpers
+Overlaps slice decoding, inference and encoding with bounded queues
+"""
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StageStats:
+    """Busy time and item count for one pipeline stage"""
+
+    def __init__(self):
+        self.frames = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds, frames=1):
+        """Record work done by the stage"""
+        with self._lock:
+            self.frames += frames
+            self.seconds += seconds
+
+    def as_dict(self):
+        """Get stage throughput summary"""
+        return {
+            'frames': self.frames,
+            'busy_seconds': round(self.seconds, 3),
+            'fps': round(self.frames / self.seconds, 1) if self.seconds > 0 else None
+        }
+
+
+class PipelineStats:
+    """Per-stage throughput for a whole pipeline run"""
+
+    def __init__(self, *stages):
+        self.stages = {name: StageStats() for name in stages}
+        self._start = time.perf_counter()
+
+    def __getitem__(self, name):
+        return self.stages[name]
+
+    def as_dict(self):
+        """Get summary with per-stage and wall-clock throughput"""
+        wall = time.perf_counter() - self._start
+        summary = {name: stage.as_dict() for name, stage in self.stages.items()}
+        summary['wall_seconds'] = round(wall, 3)
+        return summary
+
+
+def iter_decoded(items, load, workers=1, max_pending=8, stats=None):
+    """
+    Decode items in a thread pool, yielding results in input order
+
+    At most max_pending items are decoded ahead of the consumer.
+
+    Args:
+        items: Iterable of inputs (consumed lazily)
+        load: Function decoding one item into a frame
+        workers: Decode threads (1 decodes inline)
+        max_pending: Maximum number of decoded-but-unconsumed frames
+        stats: Optional StageStats for decode time
+
+    Yields:
+        Tuple of (index, frame)
+    """
+    def timed_load(item):
+        start = time.perf_counter()
+        frame = load(item)
+        if stats is not None:
+            stats.add(time.perf_counter() - start)
+        return frame
+
+    if workers <= 1:
+        for idx, item in enumerate(items):
+            yield idx, timed_load(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as pool:
+        pending = deque()
+        for idx, item in enumerate(items):
+            pending.append((idx, pool.submit(timed_load, item)))
+            if len(pending) >= max_pending:
+                done_idx, future = pending.popleft()
+                yield done_idx, future.result()
+
+        while pending:
+            done_idx, future = pending.popleft()
+            yield done_idx, future.result()
+
+
+class FrameWriter:
+    """Runs writer calls in FIFO order on a dedicated thread"""
+
+    def __init__(self, max_pending=8, stats=None, threaded=True):
+        """
+        Initialize writer
+
+        Args:
+            max_pending: Queue bound; submit() blocks when full
+            stats: Optional StageStats for write time
+            threaded: Run calls on a background thread (False runs inline)
+        """
+        self.stats = stats
+        self.threaded = threaded
+        self._error = None
+        self._queue = None
+        self._thread = None
+
+        if threaded:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._thread = threading.Thread(target=self._run, name='encoder', daemon=True)
+            self._thread.start()
+
+    def _call(self, fn, args, frames):
+        start = time.perf_counter()
+        fn(*args)
+        if self.stats is not None:
+            self.stats.add(time.perf_counter() - start, frames)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._call(*task)
+            except Exception as e:
+                self._error = e
+
+    def submit(self, fn, *args, frames=1):
+        """
+        Queue a call; frames is the number of frames it counts for in stats
+        """
+        if self._error is not None:
+            raise self._error
+        if not self.threaded:
+            self._call(fn, args, frames)
+            return
+        self._queue.put((fn, args, frames))
+
+    def close(self):
+        """Wait for queued calls to finish, re-raising the first error"""
+        if self.threaded and self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,74 @@
+"""
+Result Publisher Service
+Uploads a processed series to the PHP server and writes its report
+"""
+import os
+
+from ..config import MODEL_PATH
+from ..utils.api_client import upload_file_to_php
+from .detector import get_detector
+from .report_generator import ReportGenerator
+from .video_processor import get_video_processor
+
+
+def publish_result(result, patient_name):
+    """
+    Upload video/frames to the PHP server and create the report
+
+    A partial result (deadline ran out) is published as is; its pending
+    slices are then analyzed in the background, which rewrites the report
+    and renders the deferred video.
+
+    Args:
+        result: Dictionary from VideoProcessor.process_images_to_video()
+        patient_name: Patient name shown in the response
+
+    Returns:
+        Response dictionary for the client
+    """
+    # Background/none export: no video file yet, keep the local URL
+    remote_video_url = None
+    if result['video_path']:
+        remote_video_url = upload_file_to_php(result['video_path'])
+
+    remote_frames = []
+    for local_path in result['detected_frames']:
+        remote_url = upload_file_to_php(local_path)
+        if remote_url:
+            remote_frames.append(remote_url)
+        else:
+            remote_frames.append(f'/results/{os.path.basename(local_path)}')
+
+    final_video_url = remote_video_url
+    if not final_video_url and result['video_name']:
+        final_video_url = f'/results/{result["video_name"]}'
+
+    # Overlay track is served locally next to the video (also for background exports)
+    overlay_url = f'/results/{result["overlay_name"]}' if result['overlay_name'] else None
+
+    # Generate report
+    report, report_path = ReportGenerator.create_report(
+        result, final_video_url, remote_frames
+    )
+
+    completion_url = None
+    if result.get('partial') and result['series_id']:
+        processor = get_video_processor(get_detector(MODEL_PATH))
+        processor.start_completion(result['series_id'], result['deferred_export'])
+        completion_url = f'/api/series/{result["series_id"]}'
+
+    return {
+        'success': True,
+        'video_url': final_video_url,
+        'video_status': result['video_status'],
+        'overlay_url': overlay_url,
+        'overlays_burned': result['overlays_burned'],
+        'series_id': result['series_id'],
+        'patient_name': patient_name,
+        'frame_count': result['frame_count'],
+        'detected_frames': remote_frames,
+        'partial': bool(result.get('partial')),
+        'pending_slices': result.get('pending_slices', 0),
+        'completion_url': completion_url,
+        'report_url': f'/results/{os.path.basename(report_path)}'
+    }
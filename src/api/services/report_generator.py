@@ -6,14 +6,15 @@ import json
 from datetime import datetime
 
 from ..config import RESULTS_FOLDER
-from ..utils.api_client import send_data_to_api
+from ..utils.api_client import send_data_to_api, upload_file_to_php
 
 
 class ReportGenerator:
     """Service for generating medical reports"""
     
     @staticmethod
-    def generate_report_text(patient_name, timestamp, frame_count, detections, tumor_count):
+    def generate_report_text(patient_name, timestamp, frame_count, detections, tumor_count,
+                             detection_stats=None, pending_slices=0):
         """
         Generate human-readable report text
         
@@ -23,6 +24,8 @@ class ReportGenerator:
             frame_count: Number of frames processed
             detections: List of detection details
             tumor_count: Total tumor count
+            detection_stats: Inference counters from VideoProcessor (optional)
+            pending_slices: Slices not analyzed yet (partial report)
             
         Returns:
             Formatted report string
@@ -36,6 +39,22 @@ class ReportGenerator:
             ''
         ]
         
+        if detection_stats and detection_stats.get('gated_skips'):
+            lines.insert(-1, (
+                f"Số khung hình bỏ qua suy luận (gần trùng lặp): "
+                f"{detection_stats['gated_skips']}/{frame_count}"
+            ))
+        if detection_stats and detection_stats.get('sampled_skips'):
+            lines.insert(-1, (
+                f"Số khung hình không suy luận (lấy mẫu thích ứng): "
+                f"{detection_stats['sampled_skips']}/{frame_count}"
+            ))
+        if pending_slices:
+            lines.insert(-1, (
+                f"BÁO CÁO TẠM THỜI: {pending_slices}/{frame_count} khung hình chưa được "
+                f"phân tích, kết quả sẽ được cập nhật khi hoàn tất"
+            ))
+        
         if tumor_count > 0:
             lines.append(f'KẾT LUẬN TẮT: Phát hiện {tumor_count} khối u nghi ngờ.')
             lines.append('Mô tả: Hệ thống phát hiện vùng nghi ngờ khối u trên hình ảnh CT/ảnh y tế.')
@@ -81,36 +100,34 @@ class ReportGenerator:
         frame_count = video_result['frame_count']
         detections = video_result['detections']
         tumor_count = video_result['tumor_count']
-        
-        # Generate report text
-        report_text = ReportGenerator.generate_report_text(
-            patient_name, timestamp, frame_count, detections, tumor_count
-        )
-        
-        # Determine patient status
-        if tumor_count > 0:
-            patient_status = 'Phát hiện dấu hiệu khối u. Cần đánh giá thêm bởi bác sĩ chuyên khoa.'
-        else:
-            patient_status = 'Không phát hiện khối u rõ ràng. Nếu có triệu chứng, nên kiểm tra thêm.'
+        detection_stats = video_result.get('detection_stats', {})
+        pending_slices = video_result.get('pending_slices', 0)
         
         # Build report object
         report = {
             'patient_name': patient_name,
             'safe_patient_name': safe_patient,
             'timestamp': timestamp,
-            'video_url': video_url or f'/results/{video_result["video_name"]}',
+            'video_url': video_url or (
+                f'/results/{video_result["video_name"]}' if video_result['video_name'] else None
+            ),
             'video_name': video_result['video_name'],
+            'series_id': video_result.get('series_id'),
             'frame_count': frame_count,
             'detected_frames': detected_frame_urls or [],
             'detections': detections,
             'tumor_count': tumor_count,
-            'patient_status': patient_status,
-            'report_text': report_text,
-            'summary': f'Phát hiện {tumor_count} khối u trên {frame_count} khung hình.' if tumor_count > 0 else 'Không phát hiện bất thường.'
+            'detection_stats': detection_stats,
+            'partial': bool(pending_slices),
+            'pending_slices': pending_slices,
+            **ReportGenerator._conclusions(
+                patient_name, timestamp, frame_count, detections, tumor_count,
+                detection_stats, pending_slices
+            )
         }
         
         # Save report
-        report_filename = f"{safe_patient}_{timestamp}_report.json"
+        report_filename = f"{video_result.get('run_name') or f'{safe_patient}_{timestamp}'}_report.json"
         report_path = os.path.join(RESULTS_FOLDER, report_filename)
         
         with open(report_path, 'w', encoding='utf-8') as f:
@@ -123,6 +140,77 @@ class ReportGenerator:
         
         return report, report_path
     
+    @staticmethod
+    def _conclusions(patient_name, timestamp, frame_count, detections, tumor_count,
+                     detection_stats, pending_slices=0):
+        """Build report text, patient status and summary fields"""
+        report_text = ReportGenerator.generate_report_text(
+            patient_name, timestamp, frame_count, detections, tumor_count,
+            detection_stats, pending_slices
+        )
+        
+        # Determine patient status
+        if tumor_count > 0:
+            patient_status = 'Phát hiện dấu hiệu khối u. Cần đánh giá thêm bởi bác sĩ chuyên khoa.'
+        else:
+            patient_status = 'Không phát hiện khối u rõ ràng. Nếu có triệu chứng, nên kiểm tra thêm.'
+        
+        return {
+            'patient_status': patient_status,
+            'report_text': report_text,
+            'summary': f'Phát hiện {tumor_count} khối u trên {frame_count} khung hình.' if tumor_count > 0 else 'Không phát hiện bất thường.'
+        }
+    
+    @staticmethod
+    def complete_report(series_meta, detected_frames=()):
+        """
+        Rewrite the saved report of a series that was published partial
+        
+        Args:
+            series_meta: Series metadata after the pending slices were analyzed
+            detected_frames: Local paths of tumor snapshots saved by the
+                completion, uploaded and added to the report's frames
+            
+        Returns:
+            Updated report dictionary, or None if the series has no report
+        """
+        report_path = os.path.join(RESULTS_FOLDER, f"{series_meta['series_id']}_report.json")
+        try:
+            with open(report_path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        frame_urls = []
+        for local_path in detected_frames:
+            frame_urls.append(
+                upload_file_to_php(local_path) or f'/results/{os.path.basename(local_path)}'
+            )
+        
+        report.update({
+            'detected_frames': report.get('detected_frames', []) + frame_urls,
+            'detections': series_meta['detections'],
+            'tumor_count': series_meta['tumor_count'],
+            'detection_stats': series_meta.get('detection_stats', {}),
+            'partial': False,
+            'pending_slices': 0,
+            **ReportGenerator._conclusions(
+                report['patient_name'], report['timestamp'], report['frame_count'],
+                series_meta['detections'], series_meta['tumor_count'],
+                series_meta.get('detection_stats', {})
+            )
+        })
+        
+        tmp_path = f'{report_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, report_path)
+        
+        print(f"💾 Đã cập nhật báo cáo hoàn chỉnh: {report_path}")
+        send_data_to_api(report)
+        
+        return report
+    
     @staticmethod
     def get_report(patient_name):
         """
@@ -0,0 +1,139 @@
+"""
+Priority Scheduler Service
+Shares a fixed number of compute slots between priority classes
+(interactive, standard, batch) with weighted fair queueing, keeping some
+slots free for interactive requests only
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from ..config import SCHEDULER_SLOTS, SCHEDULER_WEIGHTS, SCHEDULER_INTERACTIVE_RESERVED
+
+
+# Highest priority first; ties in fair share go to the earlier class
+PRIORITY_CLASSES = ('interactive', 'standard', 'batch')
+
+
+class PriorityScheduler:
+    """
+    Weighted fair scheduler over compute slots
+
+    Each class advances a virtual clock by 1/weight per granted slot and
+    the waiting class with the lowest clock runs next, so under contention
+    classes get slots in proportion to their weights. Non-interactive work
+    never takes the last SCHEDULER_INTERACTIVE_RESERVED slots.
+    """
+
+    def __init__(self, slots=SCHEDULER_SLOTS, weights=SCHEDULER_WEIGHTS,
+                 reserved=SCHEDULER_INTERACTIVE_RESERVED):
+        """
+        Initialize scheduler
+
+        Args:
+            slots: Work items allowed to run at once
+            weights: Dictionary class -> share weight
+            reserved: Slots only interactive work may use
+        """
+        self.slots = slots
+        self.weights = weights
+        self.reserved = min(reserved, slots - 1)
+        self._changed = threading.Condition()
+        self._waiting = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._clock = {cls: 0.0 for cls in PRIORITY_CLASSES}
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._granted = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._wait_seconds = {cls: 0.0 for cls in PRIORITY_CLASSES}
+
+    def _can_start(self, cls):
+        """Check if a slot is available to a class (caller holds the lock)"""
+        running = sum(self._running.values())
+        if running >= self.slots:
+            return False
+        if cls == 'interactive':
+            return True
+        return running - self._running['interactive'] < self.slots - self.reserved
+
+    def _next_class(self):
+        """Waiting class that should get the next slot, or None (caller holds the lock)"""
+        ready = [cls for cls in PRIORITY_CLASSES if self._waiting[cls] and self._can_start(cls)]
+        if not ready:
+            return None
+        return min(ready, key=lambda cls: (self._clock[cls], PRIORITY_CLASSES.index(cls)))
+
+    @contextmanager
+    def slot(self, cls):
+        """
+        Hold a compute slot of a priority class while the block runs
+
+        Args:
+            cls: 'interactive', 'standard' or 'batch'
+        """
+        if cls not in PRIORITY_CLASSES:
+            raise ValueError(f'Unknown priority class: {cls}')
+
+        ticket = object()
+        start = time.perf_counter()
+        with self._changed:
+            if not self._waiting[cls] and not self._running[cls]:
+                # A class returning from idle does not get credit for the idle time
+                busy = [self._clock[c] for c in PRIORITY_CLASSES
+                        if self._waiting[c] or self._running[c]]
+                if busy:
+                    self._clock[cls] = max(self._clock[cls], min(busy))
+
+            self._waiting[cls].append(ticket)
+            self._changed.wait_for(
+                lambda: self._waiting[cls][0] is ticket and self._next_class() == cls
+            )
+            self._waiting[cls].popleft()
+            self._running[cls] += 1
+            self._granted[cls] += 1
+            self._clock[cls] += 1.0 / self.weights[cls]
+            self._wait_seconds[cls] += time.perf_counter() - start
+            self._changed.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._running[cls] -= 1
+                self._changed.notify_all()
+
+    def stats(self):
+        """Get slot usage and wait times per class"""
+        with self._changed:
+            return {
+                'slots': self.slots,
+                'reserved_interactive': self.reserved,
+                'classes': {
+                    cls: {
+                        'weight': self.weights[cls],
+                        'running': self._running[cls],
+                        'waiting': len(self._waiting[cls]),
+                        'granted': self._granted[cls],
+                        'avg_wait_ms': round(
+                            self._wait_seconds[cls] * 1000 / max(1, self._granted[cls]), 1
+                        )
+                    }
+                    for cls in PRIORITY_CLASSES
+                }
+            }
+
+
+# Global scheduler instance (lazy initialization)
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Get or create global priority scheduler instance"""
+    global _scheduler
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = PriorityScheduler()
+
+    return _scheduler
@@ -0,0 +1,397 @@
+"""
+Series Store Service
+Persists decoded slices and detections per series and renders single
+slices on demand for the slice viewer API
+"""
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from ..config import (
+    SERIES_FOLDER, SERIES_STORAGE, SERIES_RETENTION, SLICE_CACHE_SIZE, SLICE_JPEG_QUALITY
+)
+from ..utils.file_utils import REDUCED_DECODE_FLAGS, to_bgr8, load_image, image_resolution
+from ..utils.npy_volume import NpyVolumeWriter, open_volume
+from ..utils.window_lut import apply_window
+from .detector import YOLODetector
+
+
+SERIES_ID_PATTERN = re.compile(r'^[\w-]+$')
+
+# format name -> (file extension, mimetype, cv2 quality flag)
+SLICE_FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+# Planes other than axial are reformatted from the volume (volume storage only)
+SLICE_PLANES = ('axial', 'coronal', 'sagittal')
+
+
+class _PngSliceWriter:
+    """Slice writer storing each slice as its own PNG"""
+
+    def __init__(self, store, series_id):
+        self.store = store
+        self.series_id = series_id
+
+    def write(self, index, frame):
+        if frame is not None:
+            self.store.save_slice(self.series_id, index, frame)
+
+    def flush(self):
+        return 0
+
+    def close(self):
+        return None
+
+
+class SeriesStore:
+    """Stores series slices as lossless PNGs plus a series.json with detections"""
+
+    def __init__(self, root=SERIES_FOLDER, cache_size=SLICE_CACHE_SIZE, storage=SERIES_STORAGE,
+                 retention=SERIES_RETENTION):
+        """
+        Initialize series store
+
+        Args:
+            root: Folder holding one sub-folder per series
+            cache_size: Maximum number of encoded slices kept in memory
+            storage: 'png' or 'volume' for newly written series
+            retention: Seconds a series is kept after its last change (None: forever)
+        """
+        self.root = root
+        self.cache_size = cache_size
+        self.storage = storage
+        self.retention = retention
+        self._pruned_at = 0.0
+        self._rendered = OrderedDict()
+        self._meta = OrderedDict()
+        self._volumes = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_valid_id(series_id):
+        """Check that a series id is safe to use as a folder name"""
+        return bool(series_id) and SERIES_ID_PATTERN.match(series_id) is not None
+
+    def series_dir(self, series_id):
+        """Get folder for a series"""
+        if not self.is_valid_id(series_id):
+            raise ValueError(f'Invalid series id: {series_id}')
+        return os.path.join(self.root, series_id)
+
+    def slice_path(self, series_id, index):
+        """Get stored slice path for a frame index"""
+        return os.path.join(self.series_dir(series_id), 'slices', f'{index:05d}.png')
+
+    def volume_path(self, series_id):
+        """Get volume file path for a series"""
+        return os.path.join(self.series_dir(series_id), 'volume.npy')
+
+    def create(self, series_id):
+        """Create the folder for a new series (and prune expired ones)"""
+        self.prune()
+        path = self.series_dir(series_id)
+        if self.storage != 'volume':
+            path = os.path.join(path, 'slices')
+        os.makedirs(path, exist_ok=True)
+
+    def delete(self, series_id):
+        """Remove a series folder and its cached metadata, volume and renders"""
+        path = self.series_dir(series_id)
+        with self._lock:
+            self._meta.pop(series_id, None)
+            self._volumes.pop(series_id, None)
+            for key in [k for k in self._rendered if k[0] == series_id]:
+                del self._rendered[key]
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _last_modified(self, series_id):
+        """Latest change to a series: its folder, series.json, slices or volume"""
+        folder = self.series_dir(series_id)
+        paths = [folder, os.path.join(folder, 'series.json'), os.path.join(folder, 'slices'),
+                 self.volume_path(series_id)]
+        return max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=0)
+
+    def prune(self, force=False):
+        """
+        Delete series not changed for retention seconds (checked at most
+        once an hour unless forced)
+
+        Returns:
+            Number of series deleted
+        """
+        if self.retention is None:
+            return 0
+        with self._lock:
+            if not force and time.monotonic() - self._pruned_at < 3600:
+                return 0
+            self._pruned_at = time.monotonic()
+
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return 0
+        cutoff = time.time() - self.retention
+        expired = [name for name in names
+                   if self.is_valid_id(name) and self._last_modified(name) < cutoff]
+        for series_id in expired:
+            self.delete(series_id)
+        if expired:
+            print(f"🧹 Đã xóa {len(expired)} series hết hạn")
+        return len(expired)
+
+    def open_writer(self, series_id, resume_count=0):
+        """
+        Get a slice writer for a new series
+
+        The writer has write(index, frame) for slices in increasing index
+        order, flush(), which returns the count to pass as resume_count when
+        continuing an interrupted series, and close(), which returns volume
+        info for series.json (or None for PNG storage).
+        """
+        if self.storage == 'volume':
+            return NpyVolumeWriter(self.volume_path(series_id), resume_count)
+        return _PngSliceWriter(self, series_id)
+
+    def load_volume(self, series_id):
+        """
+        Open the series volume memory-mapped (read-only, cached)
+
+        Returns:
+            Array of shape (slices, H, W) or None without volume storage
+        """
+        with self._lock:
+            volume = self._volumes.get(series_id)
+            if volume is None:
+                path = self.volume_path(series_id)
+                if not os.path.exists(path):
+                    return None
+                volume = open_volume(path)
+                self._volumes[series_id] = volume
+                while len(self._volumes) > 8:
+                    self._volumes.popitem(last=False)
+            self._volumes.move_to_end(series_id)
+            return volume
+
+    def save_slice(self, series_id, index, frame):
+        """
+        Store a decoded slice losslessly (keeps 16-bit and grayscale data)
+
+        Args:
+            series_id: Series id
+            index: Frame index in the series
+            frame: Decoded image array
+        """
+        cv2.imwrite(self.slice_path(series_id, index), frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+
+    def load_slice(self, series_id, index, plane='axial', reduce=1):
+        """
+        Load a stored slice in its native format
+
+        Args:
+            series_id: Series id
+            index: Slice index along the plane's axis
+            plane: 'axial', or 'coronal'/'sagittal' (volume storage only)
+            reduce: Decode PNG slices at 1/2, 1/4 or 1/8 size (grayscale);
+                volume slices are always returned at full size
+
+        Returns:
+            Image array (a view into the volume if stored as one) or None
+        """
+        volume = self.load_volume(series_id)
+        if volume is not None:
+            axis = SLICE_PLANES.index(plane)
+            if not 0 <= index < volume.shape[axis]:
+                return None
+            if plane == 'coronal':
+                return np.ascontiguousarray(volume[:, index, :])
+            if plane == 'sagittal':
+                return np.ascontiguousarray(volume[:, :, index])
+            return volume[index]
+        if plane != 'axial':
+            return None
+
+        path = self.slice_path(series_id, index)
+        if not os.path.exists(path):
+            return None
+        return load_image(path, reduce)
+
+    def _preview_reduce(self, series_id, index, width):
+        """Largest PNG decode reduction whose result is still at least width wide"""
+        if not width or self.load_volume(series_id) is not None:
+            return 1
+        native_width, _ = image_resolution(self.slice_path(series_id, index), default=(0, 0))
+        for reduce in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+            if native_width // reduce >= width:
+                return reduce
+        return 1
+
+    def save_meta(self, series_id, meta):
+        """
+        Write series.json atomically and drop cached renders of the series
+
+        Args:
+            series_id: Series id
+            meta: JSON-serializable series metadata
+        """
+        path = os.path.join(self.series_dir(series_id), 'series.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._meta.pop(series_id, None)
+            for key in [k for k in self._rendered if k[0] == series_id]:
+                del self._rendered[key]
+
+    def update_meta(self, series_id, **fields):
+        """Update top-level fields of series.json"""
+        return self.edit_meta(series_id, lambda meta: fields)
+
+    def edit_meta(self, series_id, edit):
+        """
+        Update series.json from its current content in one step
+
+        Args:
+            series_id: Series id
+            edit: Callable (meta) -> dictionary of top-level fields to set,
+                called with the store locked
+
+        Returns:
+            Updated metadata
+        """
+        with self._lock:
+            meta = {k: v for k, v in (self._read_meta(series_id) or {}).items()
+                    if not k.startswith('_')}
+            meta.update(edit(meta))
+            self.save_meta(series_id, meta)
+        return meta
+
+    def _read_meta(self, series_id):
+        """Load series.json through a small in-memory cache (caller holds the lock)"""
+        meta = self._meta.get(series_id)
+        if meta is None:
+            path = os.path.join(self.series_dir(series_id), 'series.json')
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return None
+
+            meta['_boxes'] = {
+                entry['frame_index']: entry['boxes'] for entry in meta.get('detections', [])
+            }
+            self._meta[series_id] = meta
+            while len(self._meta) > 32:
+                self._meta.popitem(last=False)
+
+        self._meta.move_to_end(series_id)
+        return meta
+
+    def get_meta(self, series_id):
+        """
+        Get series metadata
+
+        Returns:
+            Metadata dictionary or None if the series does not exist
+        """
+        with self._lock:
+            meta = self._read_meta(series_id)
+        if meta is None:
+            return None
+        return {k: v for k, v in meta.items() if not k.startswith('_')}
+
+    def render_slice(self, series_id, index, fmt='jpeg', overlays=True, width=None,
+                     quality=SLICE_JPEG_QUALITY, plane='axial', window=None):
+        """
+        Encode one slice for display, using the LRU of encoded slices
+
+        Args:
+            series_id: Series id
+            index: Frame index
+            fmt: 'jpeg' or 'webp'
+            overlays: Draw detection boxes
+            width: Resize to this width keeping the aspect ratio (None: original)
+            quality: Encoder quality 1-100
+            plane: 'axial', 'coronal' or 'sagittal' (overlays only on axial)
+            window: (center, width) for 16-bit slices (None: the series window)
+
+        Returns:
+            Tuple of (bytes, mimetype) or None if the slice does not exist
+        """
+        ext, mimetype, quality_flag = SLICE_FORMATS[fmt]
+        key = (series_id, plane, index, fmt, bool(overlays), width, quality,
+               tuple(window) if window else None)
+
+        with self._lock:
+            data = self._rendered.get(key)
+            if data is not None:
+                self._rendered.move_to_end(key)
+                self.hits += 1
+                return data, mimetype
+            self.misses += 1
+            meta = self._read_meta(series_id)
+
+        if meta is None:
+            return None
+        boxes = meta['_boxes'].get(index) if overlays and plane == 'axial' else None
+        # Thumbnails of PNG slices without boxes are decoded at reduced size
+        # (boxes are drawn at full size so they look the same at any width)
+        reduce = self._preview_reduce(series_id, index, width) if plane == 'axial' and not boxes else 1
+        frame = apply_window(self.load_slice(series_id, index, plane, reduce),
+                             window or meta.get('window'))
+        if frame is None:
+            return None
+
+        frame = YOLODetector.draw_detections(frame, boxes) if boxes else to_bgr8(frame)
+
+        if width and width < frame.shape[1]:
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+        ok, buffer = cv2.imencode(ext, frame, [quality_flag, quality])
+        if not ok:
+            return None
+        data = buffer.tobytes()
+
+        with self._lock:
+            self._rendered[key] = data
+            while len(self._rendered) > self.cache_size:
+                self._rendered.popitem(last=False)
+
+        return data, mimetype
+
+    def stats(self):
+        """Get render cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._rendered),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Global series store instance (lazy initialization)
+_series_store = None
+
+
+def get_series_store():
+    """Get or create global series store instance"""
+    global _series_store
+
+    if _series_store is None:
+        _series_store = SeriesStore()
+
+    return _series_store
@@ -0,0 +1,66 @@
+"""
+Slice Change Gate
+Skips detection on slices that are nearly identical to the last inferred slice
+"""
+import cv2
+import numpy as np
+
+from ..config import GATE_DOWNSAMPLE
+
+
+class SliceChangeGate:
+    """Cheap downsampled difference metric between consecutive slices"""
+
+    def __init__(self, threshold, size=GATE_DOWNSAMPLE):
+        """
+        Initialize gate
+
+        Args:
+            threshold: Mean absolute difference (0-255 scale) below which
+                a slice is considered unchanged
+            size: Side length of the downsampled thumbnail
+        """
+        self.threshold = threshold
+        self.size = size
+        self._reference = None
+
+    def reset(self):
+        """Forget the reference slice (e.g. at the start of a new series)"""
+        self._reference = None
+
+    def _thumbnail(self, frame):
+        """Downsample frame to a small float32 grayscale thumbnail on 0-255 scale"""
+        if frame.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            frame = cv2.cvtColor(frame, code)
+        thumb = cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        thumb = thumb.astype(np.float32)
+        if frame.dtype == np.uint16:
+            thumb *= 255.0 / 65535.0
+        return thumb
+
+    def check(self, frame):
+        """
+        Decide whether detection can be skipped for this frame
+
+        The reference is only moved when detection runs, so slow drift
+        across many skipped slices still triggers a new inference.
+
+        Args:
+            frame: Decoded image array
+
+        Returns:
+            Tuple of (skip, score)
+        """
+        thumb = self._thumbnail(frame)
+
+        if self._reference is None:
+            self._reference = thumb
+            return False, None
+
+        score = float(np.mean(np.abs(thumb - self._reference)))
+        if score < self.threshold:
+            return True, score
+
+        self._reference = thumb
+        return False, score
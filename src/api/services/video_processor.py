@@ -2,128 +2,1032 @@
 Video Processing Service
 """
 import os
+import json
+import glob
+import time
+import uuid
+import threading
 import cv2
+import numpy as np
+from collections import deque
 from datetime import datetime
 
-from ..config import RESULTS_FOLDER, VIDEO_FPS, VIDEO_CODEC
-from ..utils.file_utils import read_image_unicode, secure_patient_name, convert_grayscale_to_bgr
-from .detector import get_detector
+from ..config import (
+    RESULTS_FOLDER, VIDEO_FPS, VIDEO_CODECS, BURN_OVERLAYS, DETECTION_CACHE_ENABLED,
+    GATE_ENABLED, GATE_THRESHOLD, SAMPLING_MODE, SAMPLING_STRIDE, SAMPLING_RADIUS,
+    BODY_CROP_MODE, BODY_CROP_SAMPLES, PIPELINE_ENABLED, PIPELINE_DECODE_WORKERS,
+    PIPELINE_QUEUE_SIZE, VIDEO_EXPORT_MODE, SERIES_STORE_ENABLED, DEFAULT_WINDOW,
+    CHECKPOINT_INTERVAL, DEADLINE_DETECTION_SHARE
+)
+from ..utils.file_utils import load_image, read_images, image_sort_key, secure_patient_name, to_bgr8
+from ..utils.dicom_utils import as_image_source
+from ..utils.video_encoder import SegmentedVideoEncoder, resolve_codec, parallel_encoding_available
+from ..utils.window_lut import apply_window, resolve_window
+from .detector import YOLODetector, get_detector
+from .detection_cache import get_detection_cache
+from .slice_gate import SliceChangeGate
+from .body_crop import compute_series_bbox, offset_detections
+from .pipeline import PipelineStats, FrameWriter, iter_decoded
+from .series_store import get_series_store
+from .scheduler import get_scheduler
+from .checkpoint import SeriesCheckpoint
+from .report_generator import ReportGenerator
+
+
+# Annotated tumor snapshots saved per series (for the report)
+DETECTED_FRAME_LIMIT = 5
+
+
+def _load_frame(source):
+    """
+    Decode a slice, keeping its native channels and bit depth (None if
+    unreadable or skipped)
+    
+    Ingest decodes every slice once, so it bypasses the decoded slice
+    cache instead of evicting the slices re-analysis and the viewer reuse.
+    """
+    if source is None:
+        return None
+    return load_image(source, cache=False)
+
+
+def _write_frame(video, frame):
+    """Encode a frame, converting grayscale/16-bit slices to 8-bit BGR"""
+    video.write(to_bgr8(frame))
+
+
+def _save_frame(path, frame):
+    """Write an annotated frame to disk, logging failures"""
+    try:
+        cv2.imwrite(path, frame)
+    except Exception as e:
+        print(f"⚠️ Error saving tumor image: {e}")
+
+
+def tumor_image_path(run_name, index):
+    """Get the path of the annotated snapshot of a positive slice"""
+    return os.path.join(RESULTS_FOLDER, f'{run_name}_tumor_{index}.jpg')
+
+
+def overlay_track_path(video_path):
+    """Get the overlay track sidecar path for a video"""
+    return os.path.splitext(video_path)[0] + '.overlays.json'
+
+
+def _write_overlay_track(video_path, detections, frame_indices, size, encode_crop=None,
+                         burned=False):
+    """
+    Write detections as a compact per-frame overlay track next to the video
+    
+    Boxes are stored as [x1, y1, x2, y2] in video pixel coordinates, keyed
+    by the frame's position in the video (unreadable slices are not encoded,
+    so positions can differ from series frame indices).
+    
+    Args:
+        video_path: Encoded video path
+        detections: List of {'frame_index', 'boxes'} entries
+        frame_indices: Series frame index of each encoded video frame
+        size: (width, height) of the video
+        encode_crop: Optional (x, y, w, h) crop applied before encoding
+        burned: Boxes are already drawn into the frames (clients skip drawing)
+        
+    Returns:
+        Sidecar file path
+    """
+    dx, dy = (encode_crop[0], encode_crop[1]) if encode_crop else (0, 0)
+    position = {idx: pos for pos, idx in enumerate(frame_indices)}
+    
+    frames = {}
+    for entry in detections:
+        pos = position.get(entry['frame_index'])
+        if pos is not None:
+            frames[str(pos)] = [
+                [det['x1'] - dx, det['y1'] - dy, det['x2'] - dx, det['y2'] - dy]
+                for det in entry['boxes']
+            ]
+    
+    path = overlay_track_path(video_path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': 1,
+            'fps': VIDEO_FPS,
+            'width': size[0],
+            'height': size[1],
+            'frame_count': len(frame_indices),
+            'label': 'Tumor',
+            'burned': bool(burned),
+            'frames': frames
+        }, f, separators=(',', ':'))
+    return path
 
 
 class VideoProcessor:
     """Service for processing images into video with tumor detection"""
     
-    def __init__(self, detector=None):
+    def __init__(self, detector=None, cache=None, store=None):
         """
         Initialize video processor
         
         Args:
             detector: YOLODetector instance (optional)
+            cache: DetectionCache instance (optional)
+            store: SeriesStore for slices and detections (optional)
         """
         self.detector = detector
+        self.cache = cache
+        self.store = store
     
-    def process_images_to_video(self, image_files, patient_name, pixel_spacing=None):
+    def _detect(self, frame, stats, crop_box=None):
+        """
+        Run detection on a frame, reusing cached results when possible
+        
+        Args:
+            frame: Decoded image array
+            stats: Counters dictionary updated in place
+            crop_box: Optional (x, y, w, h) region to run the detector on;
+                returned boxes are mapped back to frame coordinates
+            
+        Returns:
+            List of detections
+        """
+        if crop_box is not None:
+            x, y, w, h = crop_box
+            frame = frame[y:y + h, x:x + w]
+        
+        detections = None
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(frame, self.detector.cache_signature())
+            detections = self.cache.get(key)
+            if detections is not None:
+                stats['cache_hits'] += 1
+        
+        if detections is None:
+            try:
+                detections = self.detector.predict(frame)
+            except Exception as e:
+                print(f'⚠️ Detection error: {e}')
+                return []
+            
+            stats['inferences'] += 1
+            if key is not None:
+                self.cache.put(key, detections)
+        
+        if crop_box is not None:
+            offset_detections(detections, crop_box[0], crop_box[1])
+        return detections
+    
+    @staticmethod
+    def apply_pixel_spacing(detections, pixel_spacing):
+        """
+        Add mm sizes to detection boxes in place
+        
+        Args:
+            detections: List of {'frame_index', 'boxes'} entries
+            pixel_spacing: Pixel spacing in mm (ignored if missing or <= 0)
+        """
+        if not pixel_spacing or pixel_spacing <= 0:
+            return
+        
+        for entry in detections:
+            for det in entry['boxes']:
+                det['width_mm'] = round(det['width_px'] * pixel_spacing, 2)
+                det['height_mm'] = round(det['height_px'] * pixel_spacing, 2)
+                det['area_mm2'] = round(det['width_mm'] * det['height_mm'], 2)
+    
+    @staticmethod
+    def _open_writer(output_path, frame, encode_crop=None, codec=None, quality=None,
+                     checkpoint=None, resume=None):
+        """
+        Open video encoder sized for the first frame (or the encode crop)
+        
+        Args:
+            output_path: Output video path
+            frame: First decoded frame
+            encode_crop: Optional (x, y, w, h) crop applied before encoding
+            codec: Codec name from VIDEO_CODECS
+            quality: Quality preset name
+            checkpoint: Optional SeriesCheckpoint keeping the encoded segments
+            resume: Checkpoint state whose segments start the video
+            
+        Returns:
+            SegmentedVideoEncoder instance
+        """
+        height, width = frame.shape[:2]
+        if encode_crop is not None:
+            width, height = encode_crop[2], encode_crop[3]
+        
+        if checkpoint is None:
+            return SegmentedVideoEncoder(output_path, (width, height), codec, quality)
+        return SegmentedVideoEncoder(
+            output_path, (width, height), codec, quality,
+            segment_dir=checkpoint.segment_dir,
+            completed_segments=resume['segments'] if resume else None
+        )
+    
+    @staticmethod
+    def _save_checkpoint(checkpoint, state, video, slices):
+        """
+        Save run progress (called on the writer thread, after all earlier writes)
+        
+        Waits for the encoded segments and flushes the stored slices so the
+        checkpoint only points at data that is on disk.
+        """
+        state['segments'] = video.completed_segments() if video is not None else []
+        state['volume_count'] = slices.flush() if slices is not None else 0
+        checkpoint.save(state)
+    
+    def _discard_outputs(self, series_id, output_path, detected_frames):
+        """Remove what an aborted run wrote (video, tumor images, stored series)"""
+        for path in [output_path] + list(detected_frames):
+            if path and os.path.exists(path):
+                os.remove(path)
+        if series_id is not None:
+            self.store.delete(series_id)
+        print(f"🗑️ Đã xóa kết quả dở dang: {os.path.basename(output_path)}")
+    
+    @staticmethod
+    def _render_frame(frame, detections, encode_crop=None):
+        """
+        Crop a frame for encoding and draw its detections
+        
+        Args:
+            frame: Decoded image array
+            detections: Boxes in original frame coordinates
+            encode_crop: Optional (x, y, w, h) crop applied before encoding
+            
+        Returns:
+            Frame ready for encoding (annotated 8-bit BGR if boxes were drawn)
+        """
+        if encode_crop is not None:
+            x, y, w, h = encode_crop
+            frame = np.ascontiguousarray(frame[y:y + h, x:x + w])
+        
+        if detections:
+            if encode_crop is not None:
+                # Boxes stay in original coordinates; shift only for drawing
+                detections = offset_detections(
+                    [dict(det) for det in detections], -encode_crop[0], -encode_crop[1]
+                )
+            frame = YOLODetector.draw_detections(frame, detections)
+        return frame
+    
+    @staticmethod
+    def _compute_crop_box(image_files, window=None):
+        """
+        Compute series-wide body crop box from a few evenly spaced slices
+        
+        Args:
+            image_files: Sorted list of image sources
+            window: Optional (center, width) applied to 16-bit slices
+            
+        Returns:
+            Tuple (x, y, w, h) or None
+        """
+        step = max(1, len(image_files) // BODY_CROP_SAMPLES)
+        samples = image_files[::step][:BODY_CROP_SAMPLES]
+        frames = (apply_window(frame, window) for frame in read_images(samples, cache=False))
+        return compute_series_bbox(frames, even=True)
+    
+    def _plan_adaptive_detections(self, image_files, stride, radius, stats, crop_box=None,
+                                  window=None, until=None, pending=None):
+        """
+        Coarse-to-fine detection over a sorted series
+        
+        Detects on every stride-th slice (plus the last one), then keeps
+        detecting within radius of every positive slice until the
+        neighborhoods come back empty.
+        
+        Args:
+            image_files: Sorted list of image sources
+            stride: Coarse sampling step
+            radius: Neighborhood radius around positive slices
+            stats: Counters dictionary updated in place
+            crop_box: Optional (x, y, w, h) detector region
+            window: Optional (center, width) applied to 16-bit slices
+            until: Optional time.perf_counter() value to stop detecting at
+            pending: Set receiving the slices still queued when until passed
+            
+        Returns:
+            Dictionary mapping frame index to detections
+        """
+        count = len(image_files)
+        planned = {}
+        queue = deque(range(0, count, stride))
+        if count - 1 not in queue:
+            queue.append(count - 1)
+        
+        while queue:
+            if until is not None and time.perf_counter() >= until:
+                pending.update(idx for idx in queue if idx not in planned)
+                break
+            idx = queue.popleft()
+            if idx in planned:
+                continue
+            
+            frame = apply_window(load_image(image_files[idx], cache=False), window)
+            if frame is None:
+                planned[idx] = []
+                continue
+            
+            planned[idx] = self._detect(frame, stats, crop_box)
+            
+            if planned[idx]:
+                for neighbor in range(max(0, idx - radius), min(count, idx + radius + 1)):
+                    if neighbor not in planned:
+                        queue.append(neighbor)
+        
+        stats['sampled_skips'] = count - len(planned) - len(pending or ())
+        return planned
+    
+    def process_images_to_video(self, image_files, patient_name, pixel_spacing=None,
+                                gate_threshold=None, sampling=None, sample_stride=None,
+                                sample_radius=None, crop=None, pipelined=None,
+                                codec=None, quality=None, export=None, burn_overlays=None,
+                                window=None, progress=None, checkpoint_dir=None, deadline=None):
         """
         Process a list of images into a video with tumor detection
         
         Args:
-            image_files: List of image file paths
+            image_files: List of image file paths or MemoryImage objects,
+                or an iterator of them consumed in arrival order (crop and
+                adaptive sampling need a list and are skipped for iterators);
+                DICOM files are read header-first and decoded lazily
             patient_name: Patient name
-            pixel_spacing: Optional pixel spacing in mm
+            pixel_spacing: Optional pixel spacing in mm (defaults to the
+                DICOM PixelSpacing header if present)
+            gate_threshold: Skip detection on slices whose downsampled
+                difference to the last inferred slice is below this value
+                (None uses config default, 0 disables gating)
+            sampling: 'exhaustive' or 'adaptive' (None uses config default)
+            sample_stride: Coarse step for adaptive sampling
+            sample_radius: Neighborhood radius for adaptive sampling
+            crop: Body auto-crop mode: 'detect', 'encode' or 'none'
+                (None uses config default)
+            pipelined: Overlap decode/inference/encode in separate threads
+                (None uses config default)
+            codec: Video codec name ('vp8', 'mjpeg', 'h264', 'mp4v'),
+                falls back to the default if unavailable
+            quality: Quality preset ('fast', 'balanced', 'high')
+            export: Video export mode: 'inline', 'background' or 'none'
+                (None uses config default; needs the series store unless inline)
+            burn_overlays: Draw boxes into video frames; when off, clients
+                render them from the overlay track sidecar (None uses config
+                default; saved tumor snapshots are always annotated)
+            window: Window for 16-bit slices, a preset name ('lung',
+                'soft_tissue', 'bone'), 'center,width' or a tuple (None uses
+                the DICOM header window, then the config default). Detection
+                and the video see the windowed slices; the series store keeps
+                the 16-bit values so other windows can be rendered later
+            progress: Optional callback progress(stage, done, total) called
+                after every slice (total is None for iterators)
+            checkpoint_dir: Folder for checkpoints of a list of slices that
+                outlives the process (e.g. a queued job). Progress is saved
+                every CHECKPOINT_INTERVAL slices; a later call with the same
+                slices and options continues from the last checkpoint
+            deadline: Optional time budget in seconds. Detection stops after
+                DEADLINE_DETECTION_SHARE of it, sampling defaults to
+                adaptive and export to background. Slices left unanalyzed
+                make the result 'partial'; once its outputs are saved the
+                caller finishes them with start_completion(), which also
+                renders the deferred video
             
         Returns:
             Dictionary with processing results
         """
-        if not image_files:
-            return {'success': False, 'error': 'No images provided'}
+        try:
+            window = resolve_window(window)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        
+        # Detection has to fit in its share of the deadline; encoding is
+        # deferred so it does not hold up the partial answer
+        detect_until = None
+        pending = set()
+        if deadline is not None:
+            detect_until = time.perf_counter() + max(0.0, deadline) * DEADLINE_DETECTION_SHARE
+            sampling = sampling or 'adaptive'
+            export = export or 'background'
+        
+        # DICOM sources only have their headers read here; pixels are
+        # decoded by the pipeline like any other slice
+        header = {}
+        
+        def as_source(source):
+            source = as_image_source(source)
+            for field in ('pixel_spacing', 'window'):
+                if field not in header and getattr(source, field, None):
+                    header[field] = getattr(source, field)
+            return source
+        
+        def series_window():
+            return window or header.get('window') or resolve_window(DEFAULT_WINDOW)
         
-        # Sort files
-        image_files = sorted(image_files)
+        # Lists are sorted (DICOM by slice position, others by name); any
+        # other iterable is a stream consumed lazily in arrival order
+        # (e.g. slices still being uploaded)
+        streaming = not isinstance(image_files, (list, tuple))
+        if not streaming:
+            if not image_files:
+                return {'success': False, 'error': 'No images provided'}
+            image_files = sorted(map(as_source, image_files), key=image_sort_key)
+            window = series_window()
+        else:
+            image_files = map(as_source, image_files)
+        
+        # Checkpoints of an earlier run of the same slices and options let
+        # it continue after the last completed chunk
+        checkpoint = None
+        resume = None
+        if checkpoint_dir and not streaming:
+            checkpoint = SeriesCheckpoint(checkpoint_dir, SeriesCheckpoint.make_signature(
+                image_files,
+                [patient_name, gate_threshold, sampling, sample_stride, sample_radius, crop,
+                 codec, quality, export, burn_overlays, window,
+                 self.store.storage if self.store is not None else None]
+            ))
+            resume = checkpoint.load()
         
         # Safe patient name
         safe_patient = secure_patient_name(patient_name)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = resume['timestamp'] if resume else datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Output name shared by the series, video, tumor images and report; the
+        # suffix keeps runs started in the same second (e.g. two studies of
+        # one patient) apart
+        run_name = resume['run_name'] if resume else f'{safe_patient}_{timestamp}_{uuid.uuid4().hex[:6]}'
         
-        # Read first frame to get dimensions
-        first_frame = read_image_unicode(image_files[0])
-        if first_frame is None:
-            return {'success': False, 'error': 'Cannot read first image'}
+        # Series-wide body box, computed once from a few sampled slices
+        crop_mode = crop or BODY_CROP_MODE
+        crop_box = None
+        if resume:
+            crop_box = tuple(resume['crop_box']) if resume['crop_box'] else None
+        elif crop_mode in ('detect', 'encode') and not streaming:
+            crop_box = self._compute_crop_box(image_files, window)
+            if crop_box is not None:
+                print(f"✂️ Vùng cơ thể: {crop_box}")
+        encode_crop = crop_box if crop_mode == 'encode' else None
         
-        first_frame = convert_grayscale_to_bgr(first_frame)
-        height, width = first_frame.shape[:2]
+        # Slices and detections are kept for the slice viewer; without a
+        # store the video is the only output and is always rendered inline
+        series_id = run_name
+        export = export or VIDEO_EXPORT_MODE
+        slices = None
+        if self.store is None:
+            series_id = None
+            export = 'inline'
+        else:
+            self.store.create(series_id)
+            slices = self.store.open_writer(series_id, resume['volume_count'] if resume else 0)
         
-        # Setup video writer
-        output_name = f'{safe_patient}_{timestamp}.webm'
+        # Video writer is opened on the first decoded frame
+        codec = resolve_codec(codec)
+        output_name = f'{run_name}{VIDEO_CODECS[codec][1]}'
         output_path = os.path.join(RESULTS_FOLDER, output_name)
-        
-        fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODEC)
-        video = cv2.VideoWriter(output_path, fourcc, VIDEO_FPS, (width, height))
-        
-        if not video.isOpened():
-            return {'success': False, 'error': 'Cannot initialize video writer'}
+        video = None
+        video_frames = []
+        decoded = 0
+        if burn_overlays is None:
+            burn_overlays = BURN_OVERLAYS
         
         # Process frames
         detected_frames = []
         all_detections = []
         tumor_count = 0
+        stats = {'inferences': 0, 'cache_hits': 0, 'gated_skips': 0, 'sampled_skips': 0}
         
-        for idx, image_path in enumerate(image_files):
-            frame = read_image_unicode(image_path)
-            if frame is None:
-                continue
-            
-            frame = convert_grayscale_to_bgr(frame)
-            
-            # Detect tumors if detector available
-            frame_detections = []
-            if self.detector and self.detector.is_loaded():
-                frame, frame_detections = self.detector.detect_and_draw(frame)
+        if gate_threshold is None:
+            gate_threshold = GATE_THRESHOLD if GATE_ENABLED else 0
+        gate = SliceChangeGate(gate_threshold) if gate_threshold > 0 else None
+        previous_detections = []
+        
+        # Slices before resume_from keep their checkpointed detections. They
+        # are not decoded again unless the video has to be re-encoded from
+        # the start (serial encoder, whose output cannot be continued)
+        resume_from = 0
+        replay_boxes = {}
+        replay_frames = set()
+        replay_video = False
+        if resume:
+            resume_from = resume['done']
+            decoded = resume['decoded']
+            detected_frames = resume['detected_frames']
+            all_detections = resume['detections']
+            tumor_count = resume['tumor_count']
+            stats = resume['stats']
+            previous_detections = resume['previous_detections']
+            video_frames = resume['video_frames']
+            replay_video = bool(video_frames) and not (
+                resume['segments'] and parallel_encoding_available()
+            )
+            if replay_video:
+                replay_boxes = {entry['frame_index']: entry['boxes'] for entry in all_detections}
+                replay_frames = set(video_frames)
+            print(f"♻️ Tiếp tục từ lát cắt {resume_from}/{len(image_files)}")
+            if progress is not None:
+                progress('resuming', resume_from, len(image_files))
+        
+        # Adaptive sampling decides detections up front; the loop below
+        # then only renders and encodes
+        planned = None
+        sample_radius = max(0, sample_radius if sample_radius is not None else SAMPLING_RADIUS)
+        if ((sampling or SAMPLING_MODE) == 'adaptive' and not streaming
+                and self.detector and self.detector.is_loaded()):
+            planned = self._plan_adaptive_detections(
+                image_files,
+                max(1, sample_stride or SAMPLING_STRIDE),
+                sample_radius,
+                stats,
+                crop_box=crop_box,
+                window=window,
+                until=detect_until,
+                pending=pending
+            )
+        
+        # Decode in a thread pool and encode on a dedicated thread so both
+        # overlap with inference; frame order is preserved by both stages
+        if pipelined is None:
+            pipelined = PIPELINE_ENABLED
+        pipeline_stats = PipelineStats('decode', 'infer', 'encode')
+        sources = image_files
+        if resume_from and not replay_video:
+            sources = [None] * resume_from + image_files[resume_from:]
+        frames = iter_decoded(
+            sources, _load_frame,
+            workers=PIPELINE_DECODE_WORKERS if pipelined else 1,
+            max_pending=PIPELINE_QUEUE_SIZE,
+            stats=pipeline_stats['decode']
+        )
+        writer = FrameWriter(PIPELINE_QUEUE_SIZE, pipeline_stats['encode'], threaded=pipelined)
+        frame_count = 0
+        finished = False
+        
+        try:
+            for idx, frame in frames:
+                frame_count = idx + 1
+                if frame is None:
+                    continue
+                replay = idx < resume_from
                 
-                if frame_detections:
-                    # Add pixel spacing info if available
-                    for det in frame_detections:
-                        if pixel_spacing and pixel_spacing > 0:
-                            det['width_mm'] = round(det['width_px'] * pixel_spacing, 2)
-                            det['height_mm'] = round(det['height_px'] * pixel_spacing, 2)
-                            det['area_mm2'] = round(det['width_mm'] * det['height_mm'], 2)
+                # The store keeps native values; everything else sees the
+                # windowed slice (streams learn the DICOM window on arrival)
+                if not replay:
+                    decoded += 1
+                    if slices is not None:
+                        writer.submit(slices.write, idx, frame, frames=0)
+                if decoded == 1 and streaming:
+                    window = series_window()
+                frame = apply_window(frame, window)
+                
+                if export == 'inline' and video is None:
+                    video = self._open_writer(output_path, frame, encode_crop, codec, quality,
+                                              checkpoint, None if replay_video else resume)
+                    if not video.isOpened():
+                        return {'success': False, 'error': 'Cannot initialize video writer'}
+                
+                if replay:
+                    # Checkpointed slice: only encode it again
+                    if video is not None and idx in replay_frames:
+                        boxes = replay_boxes.get(idx) if burn_overlays else None
+                        writer.submit(_write_frame, video,
+                                      self._render_frame(frame, boxes, encode_crop))
+                    continue
+                
+                infer_start = time.perf_counter()
+                
+                # Detect tumors if detector available
+                frame_detections = []
+                if planned is not None:
+                    frame_detections = [dict(det) for det in planned.get(idx, [])]
+                elif self.detector and self.detector.is_loaded():
+                    skip = False
+                    if gate is not None:
+                        region = frame
+                        if crop_box is not None:
+                            x, y, w, h = crop_box
+                            region = frame[y:y + h, x:x + w]
+                        skip, _ = gate.check(region)
                     
+                    if skip:
+                        # Near-duplicate of last inferred slice: reuse its boxes
+                        stats['gated_skips'] += 1
+                        frame_detections = [dict(det) for det in previous_detections]
+                    elif detect_until is not None and time.perf_counter() >= detect_until:
+                        # Out of time: analyzed by the background completion
+                        pending.add(idx)
+                    else:
+                        frame_detections = self._detect(frame, stats, crop_box)
+                        previous_detections = [dict(det) for det in frame_detections]
+                
+                annotated = None
+                if frame_detections and (len(detected_frames) < DETECTED_FRAME_LIMIT or
+                                         (burn_overlays and video is not None)):
+                    annotated = self._render_frame(frame, frame_detections, encode_crop)
+                
+                if frame_detections:
                     all_detections.append({
                         'frame_index': idx,
                         'boxes': frame_detections
                     })
                     tumor_count += len(frame_detections)
                     
-                    # Save detected frame (limit to 5)
-                    if len(detected_frames) < 5:
-                        tumor_img_name = f'{safe_patient}_{timestamp}_tumor_{idx}.jpg'
-                        tumor_img_path = os.path.join(RESULTS_FOLDER, tumor_img_name)
-                        try:
-                            cv2.imwrite(tumor_img_path, frame)
-                            detected_frames.append(tumor_img_path)
-                        except Exception as e:
-                            print(f"⚠️ Error saving tumor image: {e}")
-            
-            video.write(frame)
-            
-            if (idx + 1) % 10 == 0:
-                print(f"✅ Processed {idx + 1} frames")
+                    # Save detected frame (limit to DETECTED_FRAME_LIMIT)
+                    if len(detected_frames) < DETECTED_FRAME_LIMIT:
+                        tumor_img_path = tumor_image_path(run_name, idx)
+                        writer.submit(_save_frame, tumor_img_path, annotated, frames=0)
+                        detected_frames.append(tumor_img_path)
+                
+                pipeline_stats['infer'].add(time.perf_counter() - infer_start)
+                if video is not None:
+                    if annotated is None or not burn_overlays:
+                        annotated = self._render_frame(frame, None, encode_crop)
+                    writer.submit(_write_frame, video, annotated)
+                    video_frames.append(idx)
+                
+                if (idx + 1) % 10 == 0:
+                    print(f"✅ Processed {idx + 1} frames")
+                if progress is not None:
+                    progress('processing', idx + 1, None if streaming else len(image_files))
+                
+                # Checkpoint on encoder segment boundaries so the saved
+                # segments hold exactly the frames before it (never after
+                # the last slice: the resumed run must still open the video)
+                if checkpoint is not None and idx + 1 < len(image_files) and (
+                    video_frames[-1:] == [idx] and len(video_frames) % video.segment_frames == 0
+                    if video is not None and video.parallel
+                    else (idx + 1) % CHECKPOINT_INTERVAL == 0
+                ):
+                    writer.submit(self._save_checkpoint, checkpoint, {
+                        'done': idx + 1,
+                        'timestamp': timestamp,
+                        'run_name': run_name,
+                        'crop_box': list(crop_box) if crop_box else None,
+                        'decoded': decoded,
+                        'detected_frames': list(detected_frames),
+                        'detections': list(all_detections),
+                        'tumor_count': tumor_count,
+                        'stats': dict(stats),
+                        'previous_detections': previous_detections,
+                        'video_frames': list(video_frames)
+                    }, video, slices, frames=0)
+            finished = True
+        finally:
+            writer.close()
+            if video is not None:
+                video.release()
+            volume_info = slices.close() if slices is not None else None
+            # A checkpointed run keeps its outputs to continue from them
+            if not finished and checkpoint is None:
+                self._discard_outputs(series_id, output_path, detected_frames)
+        
+        if not decoded:
+            if checkpoint is None:
+                self._discard_outputs(series_id, output_path, detected_frames)
+            return {'success': False, 'error': 'Cannot read any image'}
+        
+        # Add pixel spacing info if available
+        if pixel_spacing is None and header.get('pixel_spacing'):
+            pixel_spacing = header['pixel_spacing']
+            print(f"📏 Pixel spacing từ DICOM: {pixel_spacing} mm")
+        self.apply_pixel_spacing(all_detections, pixel_spacing)
+        
+        overlay_path = None
+        if video is not None:
+            overlay_path = _write_overlay_track(
+                output_path, all_detections, video_frames, video.size, encode_crop, burn_overlays
+            )
+        
+        if series_id is not None:
+            self.store.save_meta(series_id, {
+                'series_id': series_id,
+                'patient_name': patient_name,
+                'timestamp': timestamp,
+                'frame_count': frame_count,
+                'detections': all_detections,
+                'tumor_count': tumor_count,
+                'pixel_spacing': pixel_spacing,
+                'encode_crop': list(encode_crop) if encode_crop else None,
+                'crop_box': list(crop_box) if crop_box else None,
+                'window': list(window) if window else None,
+                'volume': volume_info,
+                'detection_stats': stats,
+                'partial': bool(pending),
+                'pending_slices': sorted(pending),
+                # Completion also scans these around slices found positive
+                'unsampled_slices': sorted(
+                    set(range(frame_count)) - set(planned) - pending
+                ) if planned is not None and pending else [],
+                'sample_radius': sample_radius,
+                'video': {
+                    'status': 'done' if video is not None else (
+                        'pending' if pending and export == 'background' else 'none'
+                    ),
+                    'name': output_name if video is not None else None,
+                    'burn_overlays': burn_overlays
+                }
+            })
+            # A partial series renders its video after the background completion
+            if export == 'background' and not pending:
+                self.start_export(series_id, codec, quality, burn_overlays)
         
-        video.release()
+        if checkpoint is not None:
+            checkpoint.clear()
         
+        pipeline_summary = pipeline_stats.as_dict()
+        encode_summary = video.stats() if video is not None else None
+        print(
+            f"⏱️ decode {pipeline_summary['decode']['fps']} fps, "
+            f"infer {pipeline_summary['infer']['fps']} fps, "
+            + (f"encode {encode_summary['fps']} fps "
+               f"({encode_summary['codec']}, {encode_summary['segments']} segments), "
+               if encode_summary else "")
+            + f"tổng {pipeline_summary['wall_seconds']}s"
+        )
+        
+        if stats['cache_hits']:
+            print(f"♻️ Dùng lại kết quả cache cho {stats['cache_hits']} frames")
+        if stats['gated_skips']:
+            print(f"⏭️ Bỏ qua suy luận cho {stats['gated_skips']} frames gần trùng lặp")
+        if stats['sampled_skips']:
+            print(f"⏭️ Lấy mẫu thích ứng: bỏ qua {stats['sampled_skips']} frames")
+        if pending:
+            print(f"⏳ Hết thời gian: {len(pending)} frames chưa phân tích")
+        
+        # In background mode the video appears under its final name once done
+        has_video = export in ('inline', 'background')
         return {
             'success': True,
-            'video_path': output_path,
-            'video_name': output_name,
-            'frame_count': len(image_files),
+            'video_path': output_path if video is not None else None,
+            'video_name': output_name if has_video else None,
+            'video_status': 'done' if video is not None else ('pending' if has_video else 'none'),
+            'overlay_path': overlay_path,
+            'overlay_name': overlay_track_path(output_name) if has_video else None,
+            'overlays_burned': bool(burn_overlays),
+            'series_id': series_id,
+            'frame_count': frame_count,
             'detected_frames': detected_frames,
             'detections': all_detections,
             'tumor_count': tumor_count,
+            'detection_stats': stats,
+            'pipeline_stats': pipeline_summary,
+            'encode_stats': encode_summary,
+            'pixel_spacing': pixel_spacing,
+            'window': list(window) if window else None,
+            'crop_box': list(crop_box) if crop_box else None,
+            'crop_mode': crop_mode if crop_box else None,
+            'partial': bool(pending),
+            'pending_slices': len(pending),
+            'deferred_export': [codec, quality, burn_overlays] if pending and export == 'background' else None,
             'patient_name': patient_name,
             'safe_patient_name': safe_patient,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'run_name': run_name
         }
+    
+    def redetect_series(self, series_id, deadline=None):
+        """
+        Run detection again on a stored series (e.g. after a model update)
+        
+        Slices are read straight from the store (zero-copy views for volume
+        storage), so no video is decoded and the series is never held in
+        memory as a whole.
+        
+        Args:
+            series_id: Series id in the store
+            deadline: Optional time budget in seconds; slices not analyzed
+                within DEADLINE_DETECTION_SHARE of it are left pending
+                for start_completion()
+            
+        Returns:
+            Updated series metadata, or None if the series does not exist
+        """
+        meta = self.store.get_meta(series_id)
+        if meta is None:
+            return None
+        
+        stats = {'inferences': 0, 'cache_hits': 0, 'gated_skips': 0, 'sampled_skips': 0}
+        detections = []
+        tumor_count = 0
+        window = meta.get('window')
+        crop_box = meta.get('crop_box')
+        
+        # With a deadline every stride-th slice goes first, so the slices
+        # analyzed in time are spread over the whole series
+        count = meta['frame_count']
+        order = range(count)
+        detect_until = None
+        pending = []
+        if deadline is not None:
+            detect_until = time.perf_counter() + max(0.0, deadline) * DEADLINE_DETECTION_SHARE
+            order = list(range(0, count, SAMPLING_STRIDE)) + [
+                idx for idx in range(count) if idx % SAMPLING_STRIDE
+            ]
+        
+        for idx in order:
+            if detect_until is not None and time.perf_counter() >= detect_until:
+                pending.append(idx)
+                continue
+            frame = apply_window(self.store.load_slice(series_id, idx), window)
+            if frame is None:
+                continue
+            boxes = self._detect(frame, stats, crop_box)
+            if boxes:
+                detections.append({'frame_index': idx, 'boxes': boxes})
+                tumor_count += len(boxes)
+        
+        detections.sort(key=lambda entry: entry['frame_index'])
+        self.apply_pixel_spacing(detections, meta.get('pixel_spacing'))
+        print(f"🔁 Phát hiện lại {series_id}: {tumor_count} khối u, {stats['inferences']} lần suy luận"
+              + (f", {len(pending)} frames chưa phân tích" if pending else ""))
+        return self.store.update_meta(
+            series_id, detections=detections, tumor_count=tumor_count, detection_stats=stats,
+            partial=bool(pending), pending_slices=sorted(pending), unsampled_slices=[]
+        )
+    
+    def complete_series(self, series_id, update_report=True):
+        """
+        Run detection on the pending slices of a partial series
+        
+        Like adaptive sampling, slices skipped by the sampler within
+        sample_radius of a slice found positive are analyzed too. New boxes
+        are merged into the current series metadata, so changes made
+        meanwhile (e.g. pixel spacing) are kept. When the report is updated,
+        slices found positive get tumor snapshots until the series has
+        DETECTED_FRAME_LIMIT of them.
+        
+        Args:
+            series_id: Series id in the store
+            update_report: Rewrite the saved report of the series as complete
+            
+        Returns:
+            Updated series metadata, or None if the series does not exist
+        """
+        meta = self.store.get_meta(series_id)
+        if meta is None:
+            return None
+        
+        stats = dict(meta.get('detection_stats') or {
+            'inferences': 0, 'cache_hits': 0, 'gated_skips': 0, 'sampled_skips': 0
+        })
+        window = meta.get('window')
+        radius = meta.get('sample_radius') or 0
+        unsampled = set(meta.get('unsampled_slices') or [])
+        found = {}
+        snapshots = []
+        snapshot_room = 0
+        if update_report:
+            snapshot_room = DETECTED_FRAME_LIMIT - len(glob.glob(tumor_image_path(series_id, '*')))
+        queue = deque(meta.get('pending_slices') or [])
+        while queue:
+            idx = queue.popleft()
+            frame = apply_window(self.store.load_slice(series_id, idx), window)
+            if frame is None:
+                continue
+            boxes = self._detect(frame, stats, meta.get('crop_box'))
+            if boxes:
+                found[idx] = boxes
+                if len(snapshots) < snapshot_room:
+                    snapshots.append(tumor_image_path(series_id, idx))
+                    _save_frame(snapshots[-1],
+                                self._render_frame(frame, boxes, meta.get('encode_crop')))
+                for neighbor in range(idx - radius, idx + radius + 1):
+                    if neighbor in unsampled:
+                        unsampled.discard(neighbor)
+                        queue.append(neighbor)
+                        stats['sampled_skips'] -= 1
+        
+        def merge(current):
+            boxes = {entry['frame_index']: entry['boxes'] for entry in current['detections']}
+            boxes.update(found)
+            detections = [{'frame_index': idx, 'boxes': boxes[idx]} for idx in sorted(boxes)]
+            self.apply_pixel_spacing(detections, current.get('pixel_spacing'))
+            return {
+                'detections': detections,
+                'tumor_count': sum(len(entry['boxes']) for entry in detections),
+                'detection_stats': stats,
+                'partial': False,
+                'pending_slices': [],
+                'unsampled_slices': []
+            }
+        
+        meta = self.store.edit_meta(series_id, merge)
+        print(f"✅ Hoàn tất {series_id}: {len(meta['detections'])} frames có khối u")
+        if update_report:
+            ReportGenerator.complete_report(meta, snapshots)
+        return meta
+    
+    def start_completion(self, series_id, deferred_export=None, update_report=True):
+        """
+        Analyze the pending slices of a partial series in a background thread
+        
+        Args:
+            series_id: Series id in the store
+            deferred_export: [codec, quality, burn_overlays] to render the
+                video once complete, or None
+            update_report: Rewrite the saved report of the series as complete
+        """
+        if deferred_export is not None:
+            self.store.update_meta(series_id, video={'status': 'pending', 'name': None})
+        
+        def run():
+            try:
+                with get_scheduler().slot('standard'):
+                    self.complete_series(series_id, update_report)
+                if deferred_export is not None:
+                    with get_scheduler().slot('batch'):
+                        self.export_series_video(series_id, *deferred_export)
+            except Exception as e:
+                print(f"⚠️ Lỗi hoàn tất {series_id}: {e}")
+        
+        threading.Thread(target=run, name=f'complete-{series_id}', daemon=True).start()
+    
+    def export_series_video(self, series_id, codec=None, quality=None, burn_overlays=None):
+        """
+        Render the video of a stored series and its overlay track
+        
+        Args:
+            series_id: Series id in the store
+            codec: Video codec name (None uses config default)
+            quality: Quality preset name
+            burn_overlays: Draw boxes into frames (None uses config default)
+            
+        Returns:
+            Output video path, or None if the series has no slices
+        """
+        meta = self.store.get_meta(series_id)
+        if meta is None:
+            return None
+        
+        codec = resolve_codec(codec)
+        output_name = f'{series_id}{VIDEO_CODECS[codec][1]}'
+        output_path = os.path.join(RESULTS_FOLDER, output_name)
+        encode_crop = meta.get('encode_crop')
+        window = meta.get('window')
+        boxes = {entry['frame_index']: entry['boxes'] for entry in meta['detections']}
+        if burn_overlays is None:
+            burn_overlays = BURN_OVERLAYS
+        self.store.update_meta(series_id, video={'status': 'running', 'name': output_name})
+        
+        video = None
+        video_frames = []
+        try:
+            for idx in range(meta['frame_count']):
+                frame = apply_window(self.store.load_slice(series_id, idx), window)
+                if frame is None:
+                    continue
+                if video is None:
+                    video = self._open_writer(output_path, frame, encode_crop, codec, quality)
+                    if not video.isOpened():
+                        raise RuntimeError('Cannot initialize video writer')
+                frame_boxes = boxes.get(idx) if burn_overlays else None
+                _write_frame(video, self._render_frame(frame, frame_boxes, encode_crop))
+                video_frames.append(idx)
+        except Exception as e:
+            self.store.update_meta(series_id, video={
+                'status': 'failed', 'name': output_name, 'error': str(e)
+            })
+            raise
+        finally:
+            if video is not None:
+                video.release()
+        
+        if video is None:
+            self.store.update_meta(series_id, video={'status': 'none', 'name': None})
+            return None
+        
+        _write_overlay_track(
+            output_path, meta['detections'], video_frames, video.size, encode_crop, burn_overlays
+        )
+        self.store.update_meta(series_id, video={
+            'status': 'done', 'name': output_name, 'burn_overlays': burn_overlays,
+            'encode_stats': video.stats()
+        })
+        print(f"🎬 Đã xuất video: {output_path}")
+        return output_path
+    
+    def start_export(self, series_id, codec=None, quality=None, burn_overlays=None):
+        """
+        Render the series video in a background thread (batch priority)
+        
+        Args:
+            series_id: Series id in the store
+            codec: Video codec name
+            quality: Quality preset name
+            burn_overlays: Draw boxes into frames
+        """
+        self.store.update_meta(series_id, video={'status': 'pending', 'name': None})
+        
+        def run():
+            try:
+                with get_scheduler().slot('batch'):
+                    self.export_series_video(series_id, codec, quality, burn_overlays)
+            except Exception as e:
+                print(f"⚠️ Lỗi xuất video {series_id}: {e}")
+        
+        threading.Thread(target=run, name=f'export-{series_id}', daemon=True).start()
 
 
 def get_video_processor(detector=None):
     """Get video processor instance"""
-    return VideoProcessor(detector)
+    cache = get_detection_cache() if DETECTION_CACHE_ENABLED else None
+    store = get_series_store() if SERIES_STORE_ENABLED else None
+    return VideoProcessor(detector, cache, store)
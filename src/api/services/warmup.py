@@ -0,0 +1,96 @@
+"""
+Model Warmup Service
+Loads the detector and runs warmup inferences at startup, tracking readiness
+"""
+import time
+import threading
+
+from ..config import MODEL_PATH, WARMUP_SIZES, WARMUP_RUNS
+from .detector import get_detector
+
+
+class ModelWarmup:
+    """Startup phase that loads and warms the detector before reporting ready"""
+
+    def __init__(self, model_path=MODEL_PATH, sizes=WARMUP_SIZES, runs=WARMUP_RUNS):
+        """
+        Initialize warmup
+
+        Args:
+            model_path: Path to YOLO model file
+            sizes: List of (width, height) slice sizes to warm up
+            runs: Number of inferences per size
+        """
+        self.model_path = model_path
+        self.sizes = sizes
+        self.runs = runs
+        self.state = 'pending'
+        self.error = None
+        self.load_ms = None
+        self.timings = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, background=True):
+        """
+        Start the warmup phase (only once)
+
+        Args:
+            background: Run in a daemon thread instead of blocking
+        """
+        with self._lock:
+            if self.state != 'pending':
+                return
+            self.state = 'warming'
+
+        if background:
+            self._thread = threading.Thread(target=self._run, name='model-warmup', daemon=True)
+            self._thread.start()
+        else:
+            self._run()
+
+    def _run(self):
+        """Load model and run warmup inferences"""
+        try:
+            start = time.perf_counter()
+            detector = get_detector(self.model_path)
+            self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+
+            if detector is None or not detector.is_loaded():
+                raise RuntimeError(f'Model not loaded from {self.model_path}')
+
+            self.timings = detector.warmup(self.sizes, self.runs)
+            self.state = 'ready'
+            print(f"🔥 Warmup xong: load {self.load_ms} ms, {len(self.timings)} lần suy luận")
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            print(f"⚠️ Warmup thất bại: {e}")
+
+    def is_ready(self):
+        """Check if the model is loaded and warmed up"""
+        return self.state == 'ready'
+
+    def status(self):
+        """Get warmup status dictionary"""
+        return {
+            'ready': self.is_ready(),
+            'state': self.state,
+            'error': self.error,
+            'load_ms': self.load_ms,
+            'warmup_timings': self.timings
+        }
+
+
+# Global warmup instance (lazy initialization)
+_warmup = None
+
+
+def get_warmup():
+    """Get or create global warmup instance"""
+    global _warmup
+
+    if _warmup is None:
+        _warmup = ModelWarmup()
+
+    return _warmup
@@ -1,3 +1,6 @@
 # Utils package
-from .file_utils import read_image_unicode, secure_patient_name
+from .file_utils import (
+    read_image_unicode, secure_patient_name, MemoryImage, decode_image_bytes, load_image,
+    read_images
+)
 from .api_client import send_data_to_api, upload_file_to_php
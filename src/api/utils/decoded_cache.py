@@ -0,0 +1,111 @@
+"""
+Decoded slice cache
+Keeps decoded slice arrays in memory (LRU within a byte budget) so the same
+slices are not decoded again by re-analysis, thumbnails and the viewer
+"""
+import threading
+from collections import OrderedDict
+
+from ..config import DECODED_CACHE_BYTES
+
+
+class DecodedSliceCache:
+    """
+    Process-wide LRU of decoded slices bounded by total array size
+
+    Cached arrays are shared between callers and marked read-only.
+    """
+
+    def __init__(self, max_bytes=DECODED_CACHE_BYTES):
+        """
+        Initialize cache
+
+        Args:
+            max_bytes: Budget for the summed nbytes of cached arrays (0 disables)
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look up a decoded slice
+
+        Args:
+            key: Hashable source key (see file_utils.decoded_cache_key)
+
+        Returns:
+            Read-only array, or None on miss
+        """
+        with self._lock:
+            frame = self._entries.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        """
+        Store a decoded slice, evicting least recently used ones over budget
+
+        Args:
+            key: Hashable source key
+            frame: Decoded image array (made read-only)
+
+        Returns:
+            The stored (read-only) array
+        """
+        if frame is None or frame.nbytes > self.max_bytes:
+            return frame
+        frame.flags.writeable = False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self._entries[key] = frame
+            self.bytes += frame.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+        return frame
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Get size and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Global cache instance (lazy initialization)
+_decoded_cache = None
+
+
+def get_decoded_cache():
+    """Get or create global decoded slice cache instance"""
+    global _decoded_cache
+
+    if _decoded_cache is None:
+        _decoded_cache = DecodedSliceCache()
+
+    return _decoded_cache
@@ -0,0 +1,219 @@
+"""
+DICOM utilities
+Reads slice headers without pixel data, orders series by position and
+decodes pixel arrays lazily (needs the optional pydicom package)
+"""
+import io
+import os
+from collections.abc import Sequence
+
+import numpy as np
+
+from ..config import SLICE_HU_OFFSET, WINDOW_PRESETS
+
+try:
+    import pydicom
+    HAS_PYDICOM = True
+except ImportError:
+    pydicom = None
+    HAS_PYDICOM = False
+
+DICOM_EXTENSIONS = {'dcm', 'dicom'}
+# Files with these extensions are never probed for the DICM marker
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tif', 'tiff', 'webp'}
+# 128-byte preamble + 'DICM' marker
+DICOM_HEADER_BYTES = 132
+
+
+def is_dicom_name(filename):
+    """Check if a file name has a DICOM extension"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in DICOM_EXTENSIONS
+
+
+def is_image_name(filename):
+    """Check if a file name has a regular image extension"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_dicom_bytes(data):
+    """Check if bytes start with a DICOM preamble (first DICOM_HEADER_BYTES bytes suffice)"""
+    return data[128:DICOM_HEADER_BYTES] == b'DICM'
+
+
+def has_dicom_magic(source):
+    """
+    Check for the 'DICM' preamble marker (for DICOM files without a DICOM
+    extension, e.g. UID-named '1.2.840.113619...' files)
+
+    Args:
+        source: File path or MemoryImage
+    """
+    data = getattr(source, 'data', None)
+    if data is not None:
+        return is_dicom_bytes(data)
+    try:
+        with open(source, 'rb') as f:
+            return is_dicom_bytes(f.read(DICOM_HEADER_BYTES))
+    except (OSError, TypeError):
+        return False
+
+
+def _first_float(value):
+    """Read a (possibly multi-valued) DICOM number, None if missing"""
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        value = value[0] if len(value) else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DicomSlice:
+    """
+    One DICOM slice whose header is read eagerly and pixels on demand
+
+    Works as an image source anywhere load_image() is used.
+    """
+
+    def __init__(self, source):
+        """
+        Read the slice header (stops before pixel data)
+
+        Args:
+            source: File path or MemoryImage with the DICOM bytes
+
+        Raises:
+            RuntimeError: If pydicom is not installed
+        """
+        if not HAS_PYDICOM:
+            raise RuntimeError('pydicom is required for DICOM input (pip install pydicom)')
+
+        self.source = source
+        self.name = getattr(source, 'name', source)
+
+        header = pydicom.dcmread(self._open(), stop_before_pixels=True, force=True)
+        self.instance_number = _first_float(header.get('InstanceNumber'))
+        self.slice_location = _first_float(header.get('SliceLocation'))
+        self.pixel_spacing = _first_float(header.get('PixelSpacing'))
+        self.window_center = _first_float(header.get('WindowCenter'))
+        self.window_width = _first_float(header.get('WindowWidth'))
+        self.rescale_slope = _first_float(header.get('RescaleSlope')) or 1.0
+        self.rescale_intercept = _first_float(header.get('RescaleIntercept')) or 0.0
+        self.photometric = str(header.get('PhotometricInterpretation', 'MONOCHROME2'))
+        self.modality = str(header.get('Modality', ''))
+        self.position = self._position_along_normal(
+            header.get('ImagePositionPatient'), header.get('ImageOrientationPatient')
+        )
+
+    def _open(self):
+        """Get a readable file or stream for the slice"""
+        data = getattr(self.source, 'data', None)
+        return io.BytesIO(data) if data is not None else self.source
+
+    @staticmethod
+    def _position_along_normal(position, orientation):
+        """Project ImagePositionPatient onto the slice normal"""
+        try:
+            position = np.array([float(v) for v in position])
+            orientation = np.array([float(v) for v in orientation])
+        except (TypeError, ValueError):
+            return None
+        if position.shape != (3,) or orientation.shape != (6,):
+            return None
+        normal = np.cross(orientation[:3], orientation[3:])
+        return float(np.dot(position, normal))
+
+    @property
+    def window(self):
+        """Header VOI window as (center, width); soft tissue for CT without one"""
+        if self.window_center is not None and self.window_width:
+            return self.window_center, self.window_width
+        if self.modality == 'CT':
+            return tuple(WINDOW_PRESETS['soft_tissue'])
+        return None
+
+    @property
+    def sort_key(self):
+        """Order by position along the normal, then slice location, instance number"""
+        for value in (self.position, self.slice_location, self.instance_number):
+            if value is not None:
+                return value
+        return None
+
+    def load(self):
+        """
+        Decode the pixel data
+
+        Modality rescale is applied. Slices with a VOI window are kept as
+        16-bit HU-like values (HU - SLICE_HU_OFFSET) so any window can be
+        applied later; others are scaled to 8 bits by their min/max.
+
+        Returns:
+            uint16 or uint8 grayscale array, or None if the pixel data cannot
+            be decoded
+        """
+        try:
+            dataset = pydicom.dcmread(self._open(), force=True)
+            pixels = dataset.pixel_array
+        except Exception as e:
+            print(f"Error decoding DICOM {self.name}: {e}")
+            return None
+
+        if pixels.ndim == 3 and pixels.shape[-1] in (3, 4):
+            # Color DICOM (RGB) -> BGR like cv2-decoded images
+            return np.ascontiguousarray(pixels[..., 2::-1]).astype(np.uint8)
+        if pixels.ndim != 2:
+            pixels = pixels[0]
+
+        values = pixels.astype(np.float32) * self.rescale_slope + self.rescale_intercept
+        if self.window is not None and self.photometric == 'MONOCHROME2':
+            return np.clip(np.rint(values - SLICE_HU_OFFSET), 0, 65535).astype(np.uint16)
+
+        if self.window is not None:
+            low = self.window[0] - self.window[1] / 2
+            high = self.window[0] + self.window[1] / 2
+        else:
+            low, high = float(values.min()), float(values.max())
+
+        scaled = (values - low) * (255.0 / max(high - low, 1e-6))
+        frame = np.clip(scaled, 0, 255).astype(np.uint8)
+        if self.photometric == 'MONOCHROME1':
+            frame = 255 - frame
+        return frame
+
+    def __repr__(self):
+        return f'DicomSlice({self.name!r}, position={self.sort_key})'
+
+
+def as_image_source(source):
+    """
+    Wrap a DICOM source as DicomSlice, reading only its header
+
+    DICOM is recognized by extension, or by the DICM marker for sources
+    without a regular image extension.
+
+    Args:
+        source: File path, MemoryImage or an already wrapped source
+
+    Returns:
+        DicomSlice for DICOM files, otherwise the source unchanged
+    """
+    if isinstance(source, DicomSlice):
+        return source
+    name = os.path.basename(getattr(source, 'name', source))
+    if is_dicom_name(name) or (not is_image_name(name) and has_dicom_magic(source)):
+        return DicomSlice(source)
+    return source
+
+
+def find_dicom_files(folder):
+    """List DICOM files in a folder (by extension or by the DICM marker)"""
+    files = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and (
+            is_dicom_name(name) or (not is_image_name(name) and has_dicom_magic(path))
+        ):
+            files.append(path)
+    return files
+
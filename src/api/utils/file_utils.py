@@ -1,26 +1,236 @@
 """
 File utilities for handling images and file operations
 """
+import os
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
+from PIL import Image
 from werkzeug.utils import secure_filename
 
+from ..config import PIPELINE_DECODE_WORKERS, DECODED_CACHE_ENABLED
+from .decoded_cache import get_decoded_cache
+
+
+# Reduced-resolution decode (1/2, 1/4, 1/8) for previews: JPEG is decoded at
+# the lower scale directly, other formats are downscaled by the codec.
+# Reduced decodes are grayscale and keep 16-bit depth
+REDUCED_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+_DIGIT_RUNS = re.compile(r'(\d+)')
+
+
+class MemoryImage:
+    """Encoded image kept in memory instead of being saved to disk"""
+    
+    def __init__(self, name, data):
+        """
+        Initialize in-memory image
+        
+        Args:
+            name: File name, used for ordering and logging
+            data: Encoded image bytes (PNG/JPEG/BMP)
+        """
+        self.name = name
+        self.data = data
+    
+    def __repr__(self):
+        return f'MemoryImage({self.name!r}, {len(self.data)} bytes)'
+
+
+def _decode_flag(reduce):
+    """imdecode flag for a reduction factor (1: full resolution, native depth)"""
+    if reduce in (None, 1):
+        return cv2.IMREAD_UNCHANGED
+    if reduce not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f'reduce must be one of 1, {", ".join(map(str, REDUCED_DECODE_FLAGS))}')
+    return REDUCED_DECODE_FLAGS[reduce] | cv2.IMREAD_ANYDEPTH
+
+
+def decode_image_bytes(data, reduce=1):
+    """
+    Decode encoded image bytes without touching disk
+    
+    Args:
+        data: Encoded image bytes
+        reduce: Downscale factor 1, 2, 4 or 8 (reduced decodes are grayscale)
+        
+    Returns:
+        numpy array of image or None if error
+    """
+    flag = _decode_flag(reduce)
+    try:
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    except Exception as e:
+        print(f"Error decoding image bytes: {e}")
+        return None
+
+
+def image_source_name(source):
+    """Get display name of an image source (file path, MemoryImage or DicomSlice)"""
+    return getattr(source, 'name', source)
+
+
+def natural_sort_key(name):
+    """
+    Sort key comparing digit runs as numbers ('x.2.png' before 'x.10.png')
+    """
+    return tuple(
+        (0, int(part), '') if part.isdigit() else (1, 0, part.lower())
+        for part in _DIGIT_RUNS.split(str(name)) if part
+    )
+
+
+def image_sort_key(source):
+    """
+    Series order of an image source
+    
+    Sources with a slice position (DICOM) sort by it, before any others,
+    which sort by name with numbers compared numerically.
+    """
+    position = getattr(source, 'sort_key', None)
+    if position is not None:
+        return (0, position, ())
+    return (1, 0, natural_sort_key(image_source_name(source)))
+
+
+def decoded_cache_key(source, reduce=1):
+    """
+    Cache key identifying the decoded pixels of an image source
+    
+    Files are keyed by path, mtime and size; in-memory images by a hash of
+    their bytes. DicomSlice sources are keyed by their underlying source.
+    
+    Args:
+        source: File path, MemoryImage or DicomSlice
+        reduce: Downscale factor the slice is decoded at
+        
+    Returns:
+        Hashable key, or None if the source cannot be identified (not cached)
+    """
+    kind = 'image'
+    if hasattr(source, 'load'):
+        kind, source = 'dicom', getattr(source, 'source', None)
+    
+    if isinstance(source, MemoryImage):
+        digest = hashlib.blake2b(source.data, digest_size=16).digest()
+        return (kind, 'memory', digest, reduce)
+    if isinstance(source, str):
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return (kind, os.path.abspath(source), stat.st_mtime_ns, stat.st_size, reduce)
+    return None
+
+
+def load_image(source, reduce=1, cache=DECODED_CACHE_ENABLED):
+    """
+    Decode an image source
+    
+    Args:
+        source: File path, MemoryImage or a lazy source with load() (DicomSlice)
+        reduce: Downscale factor 1, 2, 4 or 8 for previews
+        cache: Use the process-wide decoded slice cache (returned arrays
+            are then shared and read-only)
+        
+    Returns:
+        numpy array of image or None if error
+    """
+    key = decoded_cache_key(source, reduce) if cache else None
+    if key is None:
+        return _decode_source(source, reduce)
+    
+    decoded_cache = get_decoded_cache()
+    frame = decoded_cache.get(key)
+    if frame is None:
+        frame = decoded_cache.put(key, _decode_source(source, reduce))
+    return frame
+
+
+def _decode_source(source, reduce):
+    """Decode an image source without the cache"""
+    if hasattr(source, 'load'):
+        frame = source.load()
+        if frame is None or reduce in (None, 1):
+            return frame
+        _decode_flag(reduce)
+        height, width = frame.shape[:2]
+        size = (max(1, width // reduce), max(1, height // reduce))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if isinstance(source, MemoryImage):
+        return decode_image_bytes(source.data, reduce)
+    return read_image_unicode(source, reduce)
+
+
+def image_resolution(source, default=(512, 512)):
+    """
+    Read an image's (width, height) from its header without decoding pixels
+    
+    Args:
+        source: File path or binary file object (rewound afterwards)
+        default: Returned if the format is not recognized (e.g. DICOM)
+        
+    Returns:
+        Tuple (width, height)
+    """
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        with Image.open(source) as image:
+            return image.size
+    except Exception:
+        return default
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def read_images(sources, workers=PIPELINE_DECODE_WORKERS, reduce=1, cache=DECODED_CACHE_ENABLED):
+    """
+    Decode several image sources in a thread pool (cv2 releases the GIL)
+    
+    Args:
+        sources: Iterable of file paths, MemoryImage or DicomSlice objects
+        workers: Decode threads (1 decodes inline)
+        reduce: Downscale factor 1, 2, 4 or 8 for previews
+        cache: Use the process-wide decoded slice cache
+        
+    Returns:
+        List of numpy arrays (None for unreadable sources), in input order
+    """
+    sources = list(sources)
+    if workers <= 1 or len(sources) <= 1:
+        return [load_image(source, reduce, cache) for source in sources]
+    
+    with ThreadPoolExecutor(max_workers=min(workers, len(sources)),
+                            thread_name_prefix='read') as pool:
+        return list(pool.map(lambda source: load_image(source, reduce, cache), sources))
+
 
-def read_image_unicode(path):
+def read_image_unicode(path, reduce=1):
     """
     Read image file with unicode path support
     
+    The file is read straight into a numpy buffer (no intermediate bytes
+    copy) and decoded from there.
+    
     Args:
         path: Path to image file (supports unicode characters)
+        reduce: Downscale factor 1, 2, 4 or 8 (reduced decodes are grayscale)
         
     Returns:
         numpy array of image or None if error
     """
+    flag = _decode_flag(reduce)
     try:
-        with open(path, "rb") as stream:
-            bytes_data = bytearray(stream.read())
-            numpyarray = np.asarray(bytes_data, dtype=np.uint8)
-            return cv2.imdecode(numpyarray, cv2.IMREAD_UNCHANGED)
+        return cv2.imdecode(np.fromfile(path, dtype=np.uint8), flag)
     except Exception as e:
         print(f"Error reading file {path}: {e}")
         return None
@@ -57,3 +267,27 @@ def convert_grayscale_to_bgr(frame):
     if len(frame.shape) == 2:
         return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
     return frame
+
+
+def to_bgr8(frame):
+    """
+    Convert a decoded slice to 8-bit BGR for annotation, encoding or the model
+    
+    Grayscale slices are expanded to 3 channels, 16-bit data is scaled to
+    8 bits and alpha is dropped. 8-bit BGR input is returned unchanged.
+    
+    Args:
+        frame: Input image array
+        
+    Returns:
+        8-bit BGR image array
+    """
+    if frame is None:
+        return None
+    if frame.dtype != np.uint8:
+        frame = cv2.convertScaleAbs(frame, alpha=255.0 / 65535.0)
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
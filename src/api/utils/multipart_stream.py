@@ -0,0 +1,59 @@
+"""
+Streaming multipart/form-data parser
+Yields each form part as soon as it has been fully received
+"""
+from collections import namedtuple
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+
+from ..config import STREAM_CHUNK_SIZE
+
+
+# filename is None for plain form fields
+StreamPart = namedtuple('StreamPart', ['name', 'filename', 'data'])
+
+
+def iter_multipart(stream, content_type, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Parse a multipart body incrementally
+
+    Args:
+        stream: Readable binary stream (e.g. request.stream)
+        content_type: Request Content-Type header (with boundary)
+        chunk_size: Bytes read from the stream per iteration
+
+    Yields:
+        StreamPart for each completed field or file
+    """
+    _, options = parse_options_header(content_type)
+    boundary = options.get('boundary')
+    if not boundary:
+        raise ValueError('Missing multipart boundary')
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    current = None
+    buffer = []
+
+    while True:
+        chunk = stream.read(chunk_size)
+        decoder.receive_data(chunk or None)
+
+        event = decoder.next_event()
+        while not isinstance(event, (Epilogue, NeedData)):
+            if isinstance(event, (Field, File)):
+                current = event
+                buffer = []
+            elif isinstance(event, Data):
+                buffer.append(event.data)
+                if not event.more_data:
+                    data = b''.join(buffer)
+                    buffer = []
+                    if isinstance(current, File):
+                        yield StreamPart(current.name, current.filename, data)
+                    else:
+                        yield StreamPart(current.name, None, data.decode('utf-8', 'replace'))
+            event = decoder.next_event()
+
+        if isinstance(event, Epilogue) or not chunk:
+            break
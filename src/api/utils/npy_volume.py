@@ -0,0 +1,150 @@
+"""
+Series volume files
+Writes decoded slices sequentially into a single .npy volume
+(slices x H x W) that can later be opened memory-mapped
+"""
+import os
+import ast
+
+import cv2
+import numpy as np
+
+
+# Fixed header size so the header can be rewritten once the slice count is known
+HEADER_SIZE = 128
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _npy_header(shape, dtype):
+    """Build a .npy v1.0 header padded to HEADER_SIZE bytes"""
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        'fortran_order': False,
+        'shape': tuple(shape)
+    })
+    length = HEADER_SIZE - len(NPY_MAGIC) - 2
+    header = header.ljust(length - 1) + '\n'
+    if len(header) != length:
+        raise ValueError(f'Volume header too long for shape {shape}')
+    return NPY_MAGIC + length.to_bytes(2, 'little') + header.encode('latin-1')
+
+
+def read_volume_header(path):
+    """
+    Read shape and dtype of a volume file without mapping it
+
+    Returns:
+        Tuple of (shape, dtype)
+    """
+    with open(path, 'rb') as f:
+        f.seek(len(NPY_MAGIC))
+        length = int.from_bytes(f.read(2), 'little')
+        header = ast.literal_eval(f.read(length).decode('latin-1'))
+    return header['shape'], np.dtype(header['descr'])
+
+
+def _to_slice(frame, shape, dtype):
+    """Convert a decoded slice to the volume's single-channel shape and dtype"""
+    if frame.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        frame = cv2.cvtColor(frame, code)
+    if frame.shape != shape:
+        frame = cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+    if frame.dtype != dtype:
+        if dtype == np.uint16:
+            frame = frame.astype(np.uint16) * 257
+        else:
+            frame = (frame // 257).astype(dtype)
+    return np.ascontiguousarray(frame)
+
+
+class NpyVolumeWriter:
+    """
+    Sequential writer for a (slices, H, W) volume of unknown length
+
+    Slice shape and dtype (uint8 or uint16) come from the first readable
+    slice; later slices are converted to match. Missing indices are filled
+    with zeros so volume index == series frame index.
+    """
+
+    def __init__(self, path, resume_count=0):
+        """
+        Initialize writer
+
+        Args:
+            path: Output .npy path
+            resume_count: Continue an interrupted volume after this many
+                slices (see flush()); 0 starts a new file
+        """
+        self.path = path
+        self.shape = None
+        self.dtype = None
+        self.count = 0
+        self._file = None
+
+        if resume_count and os.path.exists(path):
+            shape, self.dtype = read_volume_header(path)
+            self.shape = tuple(shape[1:])
+            self._file = open(path, 'r+b')
+            self._file.truncate(HEADER_SIZE + resume_count * self.dtype.itemsize
+                                * self.shape[0] * self.shape[1])
+            self._file.seek(0, os.SEEK_END)
+            self.count = resume_count
+
+    def write(self, index, frame):
+        """
+        Append a slice at its frame index (indices must increase)
+
+        Args:
+            index: Series frame index
+            frame: Decoded image array (None is skipped; gaps become zero slices)
+        """
+        if frame is None:
+            return
+        if self._file is None:
+            self.shape = frame.shape[:2]
+            self.dtype = np.dtype(np.uint16 if frame.dtype == np.uint16 else np.uint8)
+            self._file = open(self.path, 'wb')
+            self._file.write(_npy_header((0,) + self.shape, self.dtype))
+
+        zero = None
+        while self.count < index:
+            if zero is None:
+                zero = np.zeros(self.shape, self.dtype).tobytes()
+            self._file.write(zero)
+            self.count += 1
+
+        self._file.write(_to_slice(frame, self.shape, self.dtype).tobytes())
+        self.count += 1
+
+    def flush(self):
+        """
+        Push written slices to disk
+
+        Returns:
+            Number of slices written, the resume_count to continue from
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        return self.count
+
+    def close(self):
+        """
+        Finish the file by rewriting the header with the final slice count
+
+        Returns:
+            Dictionary with shape and dtype, or None if nothing was written
+        """
+        if self._file is None:
+            return None
+        self._file.seek(0)
+        self._file.write(_npy_header((self.count,) + self.shape, self.dtype))
+        self._file.close()
+        self._file = None
+        return {'shape': [self.count, *self.shape], 'dtype': self.dtype.name}
+
+
+def open_volume(path):
+    """Open a volume file memory-mapped, read-only"""
+    return np.load(path, mmap_mode='r')
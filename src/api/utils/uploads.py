@@ -0,0 +1,159 @@
+"""
+Upload ingestion utilities
+Keeps uploaded slices in memory and spills to disk only for very large series
+"""
+import io
+import os
+import json
+import hashlib
+
+from flask import Request
+
+from ..config import UPLOAD_MEMORY_LIMIT, allowed_file
+from .file_utils import MemoryImage
+from .dicom_utils import DICOM_HEADER_BYTES, is_dicom_bytes
+
+
+class InMemoryUploadRequest(Request):
+    """Flask request that buffers multipart files in memory below the memory limit"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_MEMORY_LIMIT:
+            return io.BytesIO()
+        return super()._get_file_stream(
+            total_content_length, content_type, filename, content_length
+        )
+
+
+def upload_extension(filename, head):
+    """
+    Get the extension an uploaded slice is stored under
+    
+    Allowed extensions are kept. Other names (no extension or an unknown
+    one, like UID-named DICOM exports '1.2.840.113619.2.55.3') are
+    accepted as 'dcm' if the content starts with a DICOM preamble.
+    
+    Args:
+        filename: Client file name
+        head: At least the first DICOM_HEADER_BYTES bytes of the content
+        
+    Returns:
+        Lowercase extension, or None if the upload is not a slice
+    """
+    if not filename:
+        return None
+    if allowed_file(filename):
+        return filename.rsplit('.', 1)[1].lower()
+    if is_dicom_bytes(head):
+        return 'dcm'
+    return None
+
+
+def upload_file_extension(file):
+    """
+    upload_extension() of a werkzeug FileStorage (the stream is rewound)
+    
+    Returns:
+        Lowercase extension, or None if the upload is not a slice
+    """
+    if not file or not file.filename:
+        return None
+    if allowed_file(file.filename):
+        return upload_extension(file.filename, b'')
+    stream = file.stream
+    position = stream.tell()
+    head = stream.read(DICOM_HEADER_BYTES)
+    stream.seek(position)
+    return upload_extension(file.filename, head)
+
+
+def collect_uploads(files, spill_folder, memory_limit=UPLOAD_MEMORY_LIMIT):
+    """
+    Collect uploaded image files as in-memory images, spilling to disk above a limit
+    
+    Args:
+        files: List of werkzeug FileStorage objects
+        spill_folder: Folder used if the total size exceeds memory_limit
+        memory_limit: Maximum bytes kept in memory
+        
+    Returns:
+        Tuple of (image sources, spilled) where sources are MemoryImage
+        objects or file paths
+    """
+    sources = []
+    total_bytes = 0
+    spilled = False
+    
+    for i, file in enumerate(files):
+        ext = upload_file_extension(file)
+        if ext is None:
+            continue
+        
+        filename = f"image_{i:04d}.{ext}"
+        
+        if spilled:
+            filepath = os.path.join(spill_folder, filename)
+            file.save(filepath)
+            sources.append(filepath)
+            continue
+        
+        data = file.read()
+        total_bytes += len(data)
+        sources.append(MemoryImage(filename, data))
+        
+        if total_bytes > memory_limit:
+            # Move everything buffered so far to disk and keep going there
+            print(f"💾 Vượt giới hạn bộ nhớ ({memory_limit} bytes), ghi ảnh ra đĩa")
+            os.makedirs(spill_folder, exist_ok=True)
+            spilled = True
+            for idx, source in enumerate(sources):
+                filepath = os.path.join(spill_folder, source.name)
+                with open(filepath, 'wb') as f:
+                    f.write(source.data)
+                sources[idx] = filepath
+    
+    return sources, spilled
+
+
+def upload_digest(file, chunk_size=1024 * 1024):
+    """
+    Hash an uploaded file's content, leaving the stream rewound
+    
+    Args:
+        file: werkzeug FileStorage
+        chunk_size: Bytes read per step
+        
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    stream = file.stream
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def submission_key(patient_name, options, slice_digests):
+    """
+    Derive the idempotency key of a create_video submission
+    
+    The same patient, processing options and slice contents (in upload
+    order) always give the same key.
+    
+    Args:
+        patient_name: Patient name
+        options: Processing options dictionary
+        slice_digests: Content digests of the uploaded slices
+        
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    digest.update(patient_name.encode('utf-8'))
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    for slice_digest in slice_digests:
+        digest.update(slice_digest.encode('ascii'))
+    return digest.hexdigest()
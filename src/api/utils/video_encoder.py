@@ -0,0 +1,373 @@
+"""
+Video encoding utilities
+Segment-parallel encoding with selectable codecs and quality presets
+"""
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from ..config import (
+    VIDEO_FPS, VIDEO_CODECS, VIDEO_DEFAULT_CODEC, VIDEO_QUALITY_PRESETS,
+    ENCODER_WORKERS, ENCODER_SEGMENT_FRAMES, FFMPEG_BINARY
+)
+
+
+# ffmpeg encoder and per-preset arguments for each codec name
+FFMPEG_CODEC_ARGS = {
+    'vp8': ('libvpx', {
+        'fast': ['-deadline', 'realtime', '-cpu-used', '8', '-b:v', '2M', '-crf', '30'],
+        'balanced': ['-deadline', 'good', '-cpu-used', '4', '-b:v', '2M', '-crf', '16'],
+        'high': ['-deadline', 'good', '-cpu-used', '1', '-b:v', '4M', '-crf', '6'],
+    }),
+    'mjpeg': ('mjpeg', {
+        'fast': ['-q:v', '8', '-pix_fmt', 'yuvj420p'],
+        'balanced': ['-q:v', '5', '-pix_fmt', 'yuvj420p'],
+        'high': ['-q:v', '2', '-pix_fmt', 'yuvj420p'],
+    }),
+    'h264': ('libx264', {
+        'fast': ['-preset', 'veryfast', '-crf', '28', '-pix_fmt', 'yuv420p'],
+        'balanced': ['-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p'],
+        'high': ['-preset', 'slow', '-crf', '18', '-pix_fmt', 'yuv420p'],
+    }),
+    'mp4v': ('mpeg4', {
+        'fast': ['-q:v', '8'],
+        'balanced': ['-q:v', '5'],
+        'high': ['-q:v', '2'],
+    }),
+}
+
+_ffmpeg_encoders = None
+_cv_codec_support = {}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ffmpeg_available():
+    """Check whether the ffmpeg binary can be found"""
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+def _ffmpeg_has_encoder(encoder):
+    """Check (once per process) whether ffmpeg was built with an encoder"""
+    global _ffmpeg_encoders
+
+    if _ffmpeg_encoders is None:
+        try:
+            output = subprocess.run(
+                [FFMPEG_BINARY, '-hide_banner', '-encoders'],
+                capture_output=True, text=True, timeout=10
+            ).stdout
+            _ffmpeg_encoders = {line.split()[1] for line in output.splitlines()
+                                if len(line.split()) > 1}
+        except (OSError, subprocess.SubprocessError):
+            _ffmpeg_encoders = set()
+    return encoder in _ffmpeg_encoders
+
+
+def _open_cv_writer(path, fourcc, fps, size, quality=None):
+    """Open a cv2.VideoWriter, passing the quality parameter when the backend accepts it"""
+    code = cv2.VideoWriter_fourcc(*fourcc)
+    if quality is not None:
+        try:
+            writer = cv2.VideoWriter(path, code, fps, size, [cv2.VIDEOWRITER_PROP_QUALITY, quality])
+            if writer.isOpened():
+                return writer
+        except (TypeError, cv2.error, AttributeError):
+            pass
+    return cv2.VideoWriter(path, code, fps, size)
+
+
+def _cv_codec_available(codec):
+    """Check (once per process) whether OpenCV can encode with a codec name"""
+    if codec not in _cv_codec_support:
+        fourcc, ext = VIDEO_CODECS[codec]
+        tmp_dir = tempfile.mkdtemp(prefix='codec_probe_')
+        try:
+            writer = _open_cv_writer(os.path.join(tmp_dir, f'probe{ext}'), fourcc, VIDEO_FPS, (64, 64))
+            _cv_codec_support[codec] = writer.isOpened()
+            writer.release()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return _cv_codec_support[codec]
+
+
+def parallel_encoding_available(workers=ENCODER_WORKERS):
+    """Check whether segments will be encoded by parallel ffmpeg processes"""
+    return workers > 1 and ffmpeg_available()
+
+
+def codec_available(codec, use_ffmpeg=None):
+    """
+    Check whether a codec name can be encoded
+
+    Args:
+        codec: Codec name from VIDEO_CODECS
+        use_ffmpeg: Check the ffmpeg build instead of OpenCV
+            (None: whichever the default encoder uses)
+
+    Returns:
+        True if the codec is usable
+    """
+    if codec not in VIDEO_CODECS:
+        return False
+    if use_ffmpeg is None:
+        use_ffmpeg = parallel_encoding_available()
+    if use_ffmpeg:
+        return _ffmpeg_has_encoder(FFMPEG_CODEC_ARGS[codec][0])
+    return _cv_codec_available(codec)
+
+
+def resolve_codec(codec=None, use_ffmpeg=None):
+    """
+    Pick a usable codec name, falling back to the default
+
+    Args:
+        codec: Requested codec name (e.g. 'vp8', 'mjpeg', 'h264')
+        use_ffmpeg: Check the ffmpeg build instead of OpenCV
+            (None: whichever the default encoder uses)
+
+    Returns:
+        Codec name that can be encoded
+    """
+    codec = (codec or VIDEO_DEFAULT_CODEC).lower()
+    if codec != VIDEO_DEFAULT_CODEC and not codec_available(codec, use_ffmpeg):
+        print(f"⚠️ Codec {codec} không khả dụng, dùng {VIDEO_DEFAULT_CODEC}")
+        codec = VIDEO_DEFAULT_CODEC
+    return codec
+
+
+def _get_pool():
+    """Get shared pool bounding the number of concurrent ffmpeg segment encoders"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ENCODER_WORKERS, thread_name_prefix='segment')
+    return _pool
+
+
+def _encode_segment(raw_path, output_path, size, fps, codec, quality):
+    """
+    Encode one segment of raw BGR frames in an ffmpeg process
+
+    Returns:
+        Seconds spent encoding
+    """
+    start = time.perf_counter()
+    encoder, presets = FFMPEG_CODEC_ARGS[codec]
+    command = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{size[0]}x{size[1]}',
+        '-r', str(fps), '-i', raw_path,
+        '-threads', '1', '-c:v', encoder, *presets[quality], output_path
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    finally:
+        os.remove(raw_path)
+    return time.perf_counter() - start
+
+
+def _fit_frame(frame, size):
+    """Convert a frame to 3-channel BGR of the encoder's (width, height)"""
+    if frame.ndim == 2:
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    elif frame.shape[2] == 4:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    if (frame.shape[1], frame.shape[0]) != tuple(size):
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+class SegmentedVideoEncoder:
+    """
+    Video writer that encodes fixed-size segments in parallel ffmpeg processes
+
+    Frames are appended to a raw file per segment, each full segment is
+    encoded by its own ffmpeg process and the results are concatenated
+    with the concat demuxer (stream copy). Without ffmpeg, or with a single
+    worker, frames are encoded serially with one cv2.VideoWriter.
+    Use like cv2.VideoWriter: write() frames from a single thread, then
+    release().
+
+    With a segment_dir the encoded segments outlive the encoder, so a run
+    that was interrupted can pass them back as completed_segments and only
+    encode the remaining frames.
+    """
+
+    def __init__(self, output_path, size, codec=None, quality=None, fps=VIDEO_FPS,
+                 workers=ENCODER_WORKERS, segment_frames=ENCODER_SEGMENT_FRAMES,
+                 segment_dir=None, completed_segments=None):
+        """
+        Initialize encoder
+
+        Args:
+            output_path: Final video path (extension should match the codec)
+            size: (width, height) of frames
+            codec: Codec name from VIDEO_CODECS
+            quality: Preset name from VIDEO_QUALITY_PRESETS (None for 'balanced')
+            fps: Frames per second
+            workers: Parallel encoder processes
+            segment_frames: Frames per segment
+            segment_dir: Folder for segments, kept after release (None: a
+                temporary folder removed on release; parallel mode only)
+            completed_segments: Encoded full segments of an earlier run that
+                make up the start of the video (parallel mode only)
+        """
+        self.output_path = output_path
+        self.size = size
+        self.fps = fps
+        self.segment_frames = segment_frames
+        self.parallel = parallel_encoding_available(workers)
+        self.codec = resolve_codec(codec, self.parallel)
+        self.quality = quality if quality in VIDEO_QUALITY_PRESETS else 'balanced'
+
+        self.frames_written = 0
+        self._busy = 0.0
+        self._segment_seconds = 0.0
+        self._collected = 0
+        self._segment_file = None
+        self._segment_frames_written = 0
+        self._futures = []
+        self._segments = []
+        self._tmp_dir = None
+        self._keep_dir = False
+        self._writer = None
+
+        if self.parallel and segment_dir:
+            os.makedirs(segment_dir, exist_ok=True)
+            self._tmp_dir = segment_dir
+            self._keep_dir = True
+            self._segments = list(completed_segments or [])
+            self.frames_written = len(self._segments) * segment_frames
+        elif self.parallel:
+            self._tmp_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(output_path))
+        else:
+            # The OpenCV FFmpeg backend ignores quality; keep its default unless asked
+            cv_quality = VIDEO_QUALITY_PRESETS[self.quality] if quality else None
+            self._writer = _open_cv_writer(
+                output_path, VIDEO_CODECS[self.codec][0], fps, size, cv_quality
+            )
+        self._resumed_frames = self.frames_written
+
+    def isOpened(self):
+        """Check if the encoder can accept frames"""
+        return self.parallel or (self._writer is not None and self._writer.isOpened())
+
+    def write(self, frame):
+        """Add an 8-bit frame (resized to the encoder size if it differs)"""
+        start = time.perf_counter()
+        try:
+            self._write(_fit_frame(frame, self.size))
+        finally:
+            self._busy += time.perf_counter() - start
+
+    def _write(self, frame):
+        """Add a BGR frame of the encoder size"""
+        self.frames_written += 1
+
+        if not self.parallel:
+            self._writer.write(frame)
+            return
+
+        if self._segment_file is None:
+            index = len(self._segments)
+            self._segment_file = open(os.path.join(self._tmp_dir, f'segment_{index:04d}.raw'), 'wb')
+        self._segment_file.write(frame.tobytes())
+        self._segment_frames_written += 1
+
+        if self._segment_frames_written >= self.segment_frames:
+            self._submit_segment()
+
+    def _submit_segment(self):
+        """Close the current raw segment and start encoding it"""
+        raw_path = self._segment_file.name
+        self._segment_file.close()
+        self._segment_file = None
+        self._segment_frames_written = 0
+
+        segment_path = os.path.splitext(raw_path)[0] + VIDEO_CODECS[self.codec][1]
+        self._segments.append(segment_path)
+        self._futures.append(_get_pool().submit(
+            _encode_segment, raw_path, segment_path, self.size, self.fps, self.codec, self.quality
+        ))
+
+    def completed_segments(self):
+        """
+        Wait for submitted segments to be encoded
+
+        Call between full segments (frames_written a multiple of
+        segment_frames) to checkpoint the encoder.
+
+        Returns:
+            Paths of all encoded segments in order (empty in serial mode)
+        """
+        if not self.parallel:
+            return []
+        self._wait_segments()
+        return list(self._segments)
+
+    def _wait_segments(self):
+        """Wait for submitted segments, adding up their encoding time"""
+        for future in self._futures[self._collected:]:
+            self._segment_seconds += future.result()
+            self._collected += 1
+
+    def _concat_segments(self):
+        """Join encoded segments into the output file without re-encoding"""
+        list_path = os.path.join(self._tmp_dir, 'segments.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in self._segments:
+                f.write(f"file '{path}'\n")
+
+        subprocess.run(
+            [FFMPEG_BINARY, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+             '-i', list_path, '-c', 'copy', self.output_path],
+            check=True, capture_output=True
+        )
+
+    def release(self):
+        """Finish encoding; blocks until all segments are encoded and joined"""
+        start = time.perf_counter()
+        try:
+            if not self.parallel:
+                if self._writer is not None:
+                    self._writer.release()
+                return
+
+            if self._segment_file is not None:
+                self._submit_segment()
+            self._wait_segments()
+            if self._segments:
+                self._concat_segments()
+        finally:
+            self._busy += time.perf_counter() - start
+            if self._tmp_dir and not self._keep_dir:
+                shutil.rmtree(self._tmp_dir, ignore_errors=True)
+                self._tmp_dir = None
+
+    def stats(self):
+        """
+        Get encoder summary (valid after release)
+
+        seconds is the time the encoder was busy: spent in write() and
+        release(), plus the time segment processes spent encoding. Time
+        waiting for frames does not count.
+        """
+        seconds = self._busy + self._segment_seconds
+        encoded = self.frames_written - self._resumed_frames
+        return {
+            'codec': self.codec,
+            'quality': self.quality,
+            'parallel': self.parallel,
+            'segments': len(self._segments) if self.parallel else 1,
+            'frames': self.frames_written,
+            'seconds': round(seconds, 3),
+            'fps': round(encoded / seconds, 1) if seconds > 0 else None
+        }
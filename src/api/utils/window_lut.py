@@ -0,0 +1,76 @@
+"""
+Window/level for 16-bit slices
+Maps 16-bit HU-like slices to 8-bit display values with precomputed
+65536-entry lookup tables, one vectorized pass per slice
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from ..config import WINDOW_PRESETS, SLICE_HU_OFFSET
+
+
+@lru_cache(maxsize=32)
+def window_lut(center, width, offset=SLICE_HU_OFFSET):
+    """
+    Build the lookup table for one window
+
+    Args:
+        center: Window level in HU
+        width: Window width in HU
+        offset: HU of stored value 0 (HU = value + offset)
+
+    Returns:
+        Read-only uint8 array of 65536 entries
+    """
+    values = np.arange(65536, dtype=np.float32) + offset
+    low = center - width / 2
+    lut = np.clip((values - low) * (255.0 / max(width, 1e-6)), 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def resolve_window(window):
+    """
+    Parse a window given as preset name, 'center,width' or (center, width)
+
+    Args:
+        window: Window specification or None
+
+    Returns:
+        Tuple (center, width) or None
+
+    Raises:
+        ValueError: If the window is unknown or malformed
+    """
+    if window is None or window == '':
+        return None
+    if isinstance(window, str):
+        if window in WINDOW_PRESETS:
+            return tuple(WINDOW_PRESETS[window])
+        parts = window.split(',')
+    else:
+        parts = list(window)
+    if len(parts) != 2:
+        raise ValueError(f'Unknown window: {window!r} (presets: {", ".join(WINDOW_PRESETS)})')
+    center, width = float(parts[0]), float(parts[1])
+    if width <= 0:
+        raise ValueError('Window width must be positive')
+    return center, width
+
+
+def apply_window(frame, window, offset=SLICE_HU_OFFSET):
+    """
+    Window a 16-bit slice to 8 bits; other slices are returned unchanged
+
+    Args:
+        frame: Decoded image array
+        window: Tuple (center, width) from resolve_window(), or None
+        offset: HU of stored value 0
+
+    Returns:
+        8-bit image array (same channels) or the input frame
+    """
+    if frame is None or window is None or frame.dtype != np.uint16:
+        return frame
+    return window_lut(window[0], window[1], offset)[frame]
@@ -4,6 +4,56 @@
 // Flag to prevent duplicate event listeners
 let analyzeButtonInitialized = false;
 
+// Hiển thị video kèm lớp vẽ khung phát hiện (overlay track do server tạo).
+// Nếu khung đã được vẽ sẵn vào video (track.burned) thì không vẽ lại.
+function renderVideoWithOverlays(container, videoUrl, overlayUrl, style) {
+  container.innerHTML = `
+    <div style="position: relative; width: 100%; max-width: 360px; margin: 0 auto;">
+      <video controls autoplay muted width="100%" style="display: block; ${style}">
+        <source src="${videoUrl}" type="video/webm">
+        <source src="${videoUrl}" type="video/mp4">
+        Trình duyệt không hỗ trợ video.
+      </video>
+      <canvas style="position: absolute; left: 0; top: 0; width: 100%; height: 100%; pointer-events: none;"></canvas>
+    </div>
+  `;
+  if (!overlayUrl) return;
+
+  const video = container.querySelector('video');
+  const canvas = container.querySelector('canvas');
+
+  fetch(overlayUrl)
+    .then(response => (response.ok ? response.json() : null))
+    .then(track => {
+      if (!track || track.burned) return;
+
+      canvas.width = track.width;
+      canvas.height = track.height;
+      const ctx = canvas.getContext('2d');
+      let lastFrame = -1;
+
+      const draw = () => {
+        if (!video.isConnected) return;
+        const frame = Math.min(track.frame_count - 1, Math.floor(video.currentTime * track.fps + 1e-3));
+        if (frame !== lastFrame) {
+          lastFrame = frame;
+          ctx.clearRect(0, 0, canvas.width, canvas.height);
+          ctx.strokeStyle = 'red';
+          ctx.fillStyle = 'red';
+          ctx.lineWidth = 2;
+          ctx.font = '18px sans-serif';
+          (track.frames[frame] || []).forEach(([x1, y1, x2, y2]) => {
+            ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+            ctx.fillText(track.label, x1, Math.max(18, y1 - 8));
+          });
+        }
+        requestAnimationFrame(draw);
+      };
+      requestAnimationFrame(draw);
+    })
+    .catch(err => console.warn('Could not load overlay track:', err));
+}
+
 // Tự động tải video mới nhất khi trang load
 async function loadLatestVideo() {
   const resultVideo = document.getElementById('result-video');
@@ -22,13 +72,11 @@ async function loadLatestVideo() {
         const videoUrl = `http://localhost:5000${data.video_url}`;
         console.log('Loading video from:', videoUrl);
 
+        const overlayUrl = data.overlay_url ? `http://localhost:5000${data.overlay_url}` : null;
+
         resultVideo.innerHTML = `
           <div style="width: 100%; text-align: center;">
-            <video controls autoplay muted width="100%" style="max-width: 360px; border-radius: 8px; background: #000;">
-              <source src="${videoUrl}" type="video/webm">
-              <source src="${videoUrl}" type="video/mp4">
-              Trình duyệt không hỗ trợ video.
-            </video>
+            <div class="video-holder"></div>
             <p style="color: #94a3b8; font-size: 14px; margin-top: 10px;">
               📹 ${data.video_name}<br>
               📅 ${data.created_time}<br>
@@ -36,6 +84,10 @@ async function loadLatestVideo() {
             </p>
           </div>
         `;
+        renderVideoWithOverlays(
+          resultVideo.querySelector('.video-holder'), videoUrl, overlayUrl,
+          'border-radius: 8px; background: #000;'
+        );
         uploadInfo.innerHTML = `✅ Đã tải video mới nhất`;
         console.log('✅ Video loaded successfully');
       }
@@ -69,6 +121,8 @@ async function handleAnalyzeClick() {
   // Gửi ảnh và tên bệnh nhân lên backend để xử lý xuất video mp4
   const formData = new FormData();
   formData.append('patient_name', patientName);
+  // Khung phát hiện được vẽ ở client từ overlay track
+  formData.append('burn_overlays', '0');
   for (const file of input.files) {
     formData.append('images', file);
   }
@@ -90,9 +144,9 @@ async function handleAnalyzeClick() {
   uploadInfo.innerHTML = `Đang xử lý ${input.files.length} ảnh và tạo video...`;
   resultVideo.innerHTML = '<div style="color: #667eea; padding: 20px;">⏳ Đang xử lý...</div>';
 
-  // Gọi API backend
+  // Gửi job lên backend, theo dõi tiến độ qua server-sent events
   try {
-    const response = await fetch('http://localhost:5000/api/create_video', {
+    const response = await fetch('http://localhost:5000/api/jobs', {
       method: 'POST',
       body: formData
     });
@@ -102,36 +156,9 @@ async function handleAnalyzeClick() {
       throw new Error(error.error || 'Lỗi khi xuất video!');
     }
 
-    const data = await response.json();
-
-    // Hiện video mp4 ở cột phải
-    if (data.success && data.video_url) {
-      // Save analysis context for chatbot
-      const analysisContext = {
-        patientName: data.patient_name,
-        frameCount: data.frame_count,
-        timestamp: new Date().toISOString(),
-        videoUrl: data.video_url,
-        detectedFrames: data.detected_frames || []
-      };
-      localStorage.setItem('latestAnalysis', JSON.stringify(analysisContext));
-      console.log('✅ Saved analysis context:', analysisContext);
-
-      resultVideo.innerHTML = `
-        <video controls autoplay muted width="100%" style="max-width: 360px; border-radius: 8px;">
-          <source src="http://localhost:5000${data.video_url}" type="video/webm">
-          <source src="http://localhost:5000${data.video_url}" type="video/mp4">
-          Trình duyệt không hỗ trợ video.
-        </video>
-      `;
-      uploadInfo.innerHTML = `
-        ✅ Đã tạo video thành công!<br>
-        Bệnh nhân: ${data.patient_name}<br>
-        Số khung hình: ${data.frame_count}
-      `;
-    } else {
-      resultVideo.innerHTML = '<div style="color: red;">❌ Không tìm thấy video kết quả.</div>';
-    }
+    const { events_url: eventsUrl } = await response.json();
+    const data = await waitForJob(`http://localhost:5000${eventsUrl}`, uploadInfo);
+    showAnalysisResult(data, resultVideo, uploadInfo);
   } catch (err) {
     resultVideo.innerHTML = '<div style="color: red;">❌ Có lỗi khi xử lý video!</div>';
     uploadInfo.innerHTML = `<br><span style="color: red;">${err.message}</span>`;
@@ -139,6 +166,68 @@ async function handleAnalyzeClick() {
   }
 }
 
+// Theo dõi job đến khi xong, hiển thị tiến độ từng giai đoạn
+function waitForJob(eventsUrl, uploadInfo) {
+  const stageLabels = {
+    queued: 'Đang chờ trong hàng đợi',
+    starting: 'Đang bắt đầu',
+    processing: 'Đang phát hiện khối u',
+    publishing: 'Đang tải kết quả lên và tạo báo cáo'
+  };
+
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(eventsUrl);
+    source.onmessage = (event) => {
+      const job = JSON.parse(event.data);
+      if (job.status === 'done') {
+        source.close();
+        resolve(job.result);
+      } else if (job.status === 'failed') {
+        source.close();
+        reject(new Error(job.error || 'Lỗi khi xuất video!'));
+      } else {
+        const { stage, done, total } = job.progress;
+        const count = total ? ` (${done}/${total})` : '';
+        uploadInfo.innerHTML = `⏳ ${stageLabels[stage] || stage}${count}...`;
+      }
+    };
+    source.onerror = () => {
+      source.close();
+      reject(new Error('Mất kết nối khi theo dõi tiến độ'));
+    };
+  });
+}
+
+function showAnalysisResult(data, resultVideo, uploadInfo) {
+  // Hiện video ở cột phải
+  if (data.success && data.video_url) {
+    // Save analysis context for chatbot
+    const analysisContext = {
+      patientName: data.patient_name,
+      frameCount: data.frame_count,
+      timestamp: new Date().toISOString(),
+      videoUrl: data.video_url,
+      detectedFrames: data.detected_frames || []
+    };
+    localStorage.setItem('latestAnalysis', JSON.stringify(analysisContext));
+    console.log('✅ Saved analysis context:', analysisContext);
+
+    renderVideoWithOverlays(
+      resultVideo,
+      `http://localhost:5000${data.video_url}`,
+      data.overlay_url && !data.overlays_burned ? `http://localhost:5000${data.overlay_url}` : null,
+      'border-radius: 8px;'
+    );
+    uploadInfo.innerHTML = `
+      ✅ Đã tạo video thành công!<br>
+      Bệnh nhân: ${data.patient_name}<br>
+      Số khung hình: ${data.frame_count}
+    `;
+  } else {
+    resultVideo.innerHTML = '<div style="color: red;">❌ Không tìm thấy video kết quả.</div>';
+  }
+}
+
 // Initialize analysis page
 function initAnalysis() {
   const analyzeBtn = document.getElementById('analyze-btn');
@@ -0,0 +1,91 @@
+"""
+Extensionless DICOM slices (UID-named exports) are accepted by the upload
+endpoints and recognized by their DICM preamble
+"""
+import os
+import io
+import sys
+import glob
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, ROOT)
+
+pydicom = pytest.importorskip('pydicom')
+from pydicom.data import get_testdata_file  # noqa: E402
+
+from api.config import RESULTS_FOLDER  # noqa: E402
+from api.services import get_job_queue, get_series_store  # noqa: E402
+import api.routes.api_routes as api_routes  # noqa: E402
+import api.services.publisher as publisher  # noqa: E402
+import api.services.report_generator as report_generator  # noqa: E402
+
+SLICES = 3
+
+
+def _dicom_parts():
+    """Upload parts of a small CT series named by UID, without extension"""
+    parts = []
+    for i in range(SLICES):
+        dataset = pydicom.dcmread(get_testdata_file('CT_small.dcm'))
+        dataset.InstanceNumber = i + 1
+        dataset.ImagePositionPatient = [0.0, 0.0, i * 5.0]
+        buffer = io.BytesIO()
+        dataset.save_as(buffer)
+        parts.append((io.BytesIO(buffer.getvalue()), f'1.2.840.113619.2.55.3.{i + 1}'))
+    return parts
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_job_queue(), 'root', str(tmp_path / 'jobs'))
+    monkeypatch.setattr(get_series_store(), 'root', str(tmp_path / 'series'))
+    monkeypatch.setattr(publisher, 'upload_file_to_php', lambda path: None)
+    monkeypatch.setattr(report_generator, 'send_data_to_api', lambda report: None)
+    import app as app_module
+    return app_module.app.test_client()
+
+
+def _remove_outputs(series_id):
+    for path in glob.glob(os.path.join(RESULTS_FOLDER, f'{series_id}*')):
+        os.remove(path)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_create_video_accepts_extensionless_dicom(client, monkeypatch, streaming):
+    monkeypatch.setattr(api_routes, 'STREAMING_UPLOADS', streaming)
+    response = client.post('/api/create_video', data={
+        'patient_name': f'Dicom Upload {streaming}',
+        'images': _dicom_parts()
+    }, content_type='multipart/form-data')
+
+    result = response.get_json()
+    assert response.status_code == 200, result
+    assert result['success']
+    assert result['frame_count'] == SLICES
+    _remove_outputs(result['series_id'])
+
+
+def test_jobs_accepts_extensionless_dicom(client):
+    response = client.post('/api/jobs', data={
+        'patient_name': 'Dicom Job',
+        'images': _dicom_parts()
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+
+    jobs = get_job_queue()
+    job_id = response.get_json()['job_id']
+    job = jobs.wait(job_id, 120)
+    assert job['status'] == 'done', job['error']
+    assert job['result']['frame_count'] == SLICES
+    _remove_outputs(job['result']['series_id'])
+
+
+def test_non_dicom_without_extension_is_rejected(client):
+    response = client.post('/api/jobs', data={
+        'patient_name': 'Not Dicom',
+        'images': [(io.BytesIO(b'\0' * 200), 'README')]
+    }, content_type='multipart/form-data')
+    assert response.status_code == 400